@@ -0,0 +1,155 @@
+"""
+Concurrency benchmark for the AI service.
+
+Starts a local fake chat-completions provider, on its own thread, that answers
+every request after a fixed artificial latency, points the Cerebras client at
+it and compares:
+
+  * blocking: N sessions calling a synchronous HTTP client from coroutines,
+    which is what the original get_answer/get_advanced_answer did.
+  * async:    N sessions going through services.ai_service.get_advanced_answer.
+
+Run from the repository root:
+
+    python -m benchmarks.ai_concurrency --sessions 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+import httpx
+
+FAKE_COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "llama3.1-8b",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": "How are you feeling today?"},
+        }
+    ],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+async def start_fake_provider(latency: float):
+    """
+    Start a minimal keep-alive HTTP/1.1 server that replies with a fixed completion.
+    """
+    body = json.dumps(FAKE_COMPLETION).encode()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                await asyncio.sleep(latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Connection: keep-alive\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def start_provider_thread(latency: float):
+    """
+    Run the fake provider on its own event loop in a background thread.
+
+    The blocking run stalls the benchmark's event loop, so the provider must not
+    share it or no reply could ever be sent.
+
+    Returns:
+        tuple: The provider base URL and a function that stops the server.
+    """
+    started = threading.Event()
+    state = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        server, state["base_url"] = loop.run_until_complete(start_fake_provider(latency))
+        state["loop"] = loop
+        started.set()
+        loop.run_forever()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        state["loop"].call_soon_threadsafe(state["loop"].stop)
+        thread.join()
+
+    return state["base_url"], stop
+
+
+async def run_blocking(base_url: str, sessions: int):
+    messages = [{"role": "user", "content": "hello"}]
+    with httpx.Client(base_url=base_url) as sync_client:
+        async def session():
+            # A synchronous call inside a coroutine holds the event loop for the whole round-trip
+            sync_client.post("/v1/chat/completions", json={"model": "llama3.1-8b", "messages": messages})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(session() for _ in range(sessions)))
+        return time.perf_counter() - started
+
+
+async def run_async(sessions: int):
+    from services import ai_service
+
+    messages = [{"role": "user", "content": "hello"}]
+    started = time.perf_counter()
+    await asyncio.gather(*(ai_service.get_advanced_answer(messages) for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    await ai_service.close_ai_client()
+    return elapsed
+
+
+async def main(sessions: int, latency: float):
+    base_url, stop_provider = start_provider_thread(latency)
+    os.environ["CEREBRAS_BASE_URL"] = base_url
+    os.environ.setdefault("CEREBRAS_API_KEY", "benchmark-key")
+    os.environ.setdefault("AI_MAX_CONCURRENCY", str(sessions))
+
+    try:
+        blocking = await run_blocking(base_url, sessions)
+        concurrent = await run_async(sessions)
+    finally:
+        stop_provider()
+
+    print(f"sessions={sessions} latency={latency:.3f}s concurrency={os.environ['AI_MAX_CONCURRENCY']}")
+    print(f"blocking client: {blocking:.3f}s ({blocking / latency:.1f} latency periods)")
+    print(f"async client:    {concurrent:.3f}s ({concurrent / latency:.1f} latency periods)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.latency))
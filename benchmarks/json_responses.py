@@ -0,0 +1,111 @@
+"""
+JSON response benchmark.
+
+Serves a --rows entry progress history (the shape of GET /progress/get/{user_id})
+through three small FastAPI apps and reports throughput:
+
+  * orm:     ORM objects validated into ProgressResponse (orm_mode) and encoded
+             with the standard json module, as every endpoint did before.
+  * orjson:  the same, with ORJSONResponse as the default response class.
+  * rows:    column rows turned into dicts and encoded by ORJSONResponse
+             directly, as the read-only list endpoints now do.
+
+Requests are sent straight to the ASGI apps, so no server or network is
+involved. The ORM objects and rows are built before timing, which leaves out
+the cost of loading full ORM objects from the database. No database is
+needed. Run from the repository root:
+
+    python -m benchmarks.json_responses --rows 10000 --requests 50
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import orjson
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+
+
+def build_app(mode: str, entries):
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from routers.progress_router import ProgressResponse
+
+    app = FastAPI(default_response_class=JSONResponse if mode == "orm" else ORJSONResponse)
+
+    @app.get("/progress", response_model=list[ProgressResponse])
+    def get_progress():
+        if mode == "rows":
+            return ORJSONResponse([entry._asdict() for entry in entries])
+        return entries
+
+    return app
+
+
+async def request(app):
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/progress", "raw_path": b"/progress", "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def run(mode: str, entries, requests: int, expected):
+    app = build_app(mode, entries)
+    body = await request(app)
+    assert orjson.loads(body) == expected, mode
+    started = time.perf_counter()
+    for _ in range(requests):
+        await request(app)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{mode:6s} {requests / elapsed:8.1f} responses/s  {elapsed / requests * 1000:7.1f} ms/response  "
+        f"{len(body) / 1024:6.0f} KiB"
+    )
+    return elapsed
+
+
+def main(rows: int, requests: int):
+    import models.conversation_history  # noqa: F401  Resolves the relationships of Progress
+    from models import Progress
+    from routers.progress_router import ProgressResponse
+
+    fields = list(ProgressResponse.__fields__)
+    ProgressRow = namedtuple("ProgressRow", fields)
+    start = datetime(2024, 1, 1, 8, 30)
+    values = [
+        (rows - i, 1, start + timedelta(hours=i, microseconds=i), i % 11, i % 7, i % 5)
+        for i in range(rows)
+    ]
+    objects = [Progress(**dict(zip(fields, value))) for value in values]
+    column_rows = [ProgressRow(*value) for value in values]
+    expected = [{**dict(zip(fields, value)), "date": value[2].isoformat()} for value in values]
+    print(f"rows={rows} requests={requests}")
+
+    baseline = asyncio.run(run("orm", objects, requests, expected))
+    asyncio.run(run("orjson", objects, requests, expected))
+    fast = asyncio.run(run("rows", column_rows, requests, expected))
+    print(f"rows vs orm speedup: {baseline / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    main(args.rows, args.requests)
@@ -0,0 +1,78 @@
+"""
+Login-storm benchmark.
+
+Fires a burst of logins while a steady stream of light, DB-bound requests runs
+through the request threadpool, and reports the latency of those other
+requests:
+
+  * inline:    bcrypt runs in the request threadpool, as the old sync /auth/token did.
+  * dedicated: bcrypt runs in auth_service's size-limited hashing executor.
+
+The request threadpool is simulated by a ThreadPoolExecutor of --threads
+workers; other requests sleep for --request-ms to stand in for a query.
+
+Run from the repository root:
+
+    python -m benchmarks.login_storm --logins 200 --threads 40
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+
+async def storm(mode: str, logins: int, threads: int, request_ms: float, password_hash: str):
+    from services import auth_service
+
+    loop = asyncio.get_running_loop()
+    request_pool = ThreadPoolExecutor(max_workers=threads)
+
+    async def login():
+        if mode == "inline":
+            await loop.run_in_executor(request_pool, auth_service.verify_password, "benchmark-password", password_hash)
+        else:
+            await auth_service._run_hashing(auth_service.pwd_context.verify_and_update, "benchmark-password", password_hash)
+
+    async def other_request():
+        started = time.perf_counter()
+        await loop.run_in_executor(request_pool, time.sleep, request_ms / 1000)
+        return (time.perf_counter() - started) * 1000
+
+    login_tasks = [asyncio.create_task(login()) for _ in range(logins)]
+    latencies = []
+    while not all(task.done() for task in login_tasks):
+        latencies.append(await other_request())
+        await asyncio.sleep(0.005)
+    await asyncio.gather(*login_tasks)
+    request_pool.shutdown()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{mode:9s} other requests={len(latencies):4d} "
+        f"p50={statistics.median(latencies):7.1f} ms p99={p99:7.1f} ms max={latencies[-1]:7.1f} ms"
+    )
+
+
+def main(logins: int, threads: int, request_ms: float):
+    from services import auth_service
+
+    password_hash = auth_service.hash_password("benchmark-password")
+    print(f"logins={logins} request threads={threads} hashing workers={auth_service.PASSWORD_HASH_WORKERS} rounds={auth_service.BCRYPT_ROUNDS}")
+    for mode in ("inline", "dedicated"):
+        asyncio.run(storm(mode, logins, threads, request_ms, password_hash))
+    auth_service.shutdown_hash_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--request-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    main(args.logins, args.threads, args.request_ms)
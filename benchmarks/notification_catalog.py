@@ -0,0 +1,74 @@
+"""
+Microbenchmark for motivational message lookup.
+
+Compares services.message_catalog against the previous implementation of
+generate_motivational_message, which rebuilt a literal dict of every message on
+each call, then filtered, sorted and linearly scanned its keys. The previous
+implementation is regenerated here from the same catalog data, and both are
+checked to return identical messages before timing.
+
+Run from the repository root:
+
+    python -m benchmarks.notification_catalog --calls 200000
+"""
+import argparse
+import random
+import timeit
+
+from services.message_catalog import catalogs, get_motivational_message
+
+
+def build_legacy_function():
+    """
+    Recreate the old function, including its per-call dict literal.
+    """
+    entries = []
+    for language, catalog in catalogs.items():
+        items = [f"{threshold!r}: {message!r}" for threshold, message in zip(catalog.thresholds, catalog.messages)]
+        items.append(f"'default': {catalog.default!r}")
+        entries.append(f"{language!r}: {{{', '.join(items)}}}")
+    source = f"""
+def generate_motivational_message(improvement_percentage, language='en'):
+    messages = {{{', '.join(entries)}}}
+    percentage_keys = [k for k in messages[language].keys() if isinstance(k, int)]
+    percentage_keys = sorted(percentage_keys, reverse=True)
+    for threshold in percentage_keys:
+        if improvement_percentage >= threshold:
+            return messages[language][threshold]
+    return messages[language]['default']
+"""
+    namespace = {}
+    exec(source, namespace)
+    return namespace["generate_motivational_message"]
+
+
+def main(calls: int):
+    legacy = build_legacy_function()
+    for language in catalogs:
+        for percentage in range(-150, 151):
+            assert legacy(percentage, language) == get_motivational_message(percentage, language)
+
+    rng = random.Random(0)
+    inputs = [(rng.randint(-120, 120), rng.choice(["en", "es"])) for _ in range(calls)]
+
+    def run_legacy():
+        for percentage, language in inputs:
+            legacy(percentage, language)
+
+    def run_catalog():
+        for percentage, language in inputs:
+            get_motivational_message(percentage, language)
+
+    legacy_time = min(timeit.repeat(run_legacy, number=1, repeat=3))
+    catalog_time = min(timeit.repeat(run_catalog, number=1, repeat=3))
+    print(f"calls={calls}")
+    print(f"previous implementation: {legacy_time / calls * 1e6:.2f} us/call")
+    print(f"message catalog:         {catalog_time / calls * 1e6:.2f} us/call")
+    print(f"speedup: {legacy_time / catalog_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.calls)
@@ -0,0 +1,79 @@
+"""
+Progress trend benchmark.
+
+Generates synthetic progress entries for --users users and computes the
+stress-level trends twice:
+
+  * loop:       a per-user Python loop (slope, EMA and volatility per user).
+  * vectorized: services.progress_trend_service.compute_trends in one pass.
+
+Both results are checked to match before the timings are printed. No database
+is needed. Run from the repository root:
+
+    python -m benchmarks.progress_trends --users 100000 --entries 30
+"""
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+
+def loop_trends(user_ids, dates, values, alpha):
+    trends = {}
+    days = dates.astype("datetime64[us]").astype(np.int64) / 86_400_000_000
+    start = 0
+    while start < len(user_ids):
+        end = start
+        while end < len(user_ids) and user_ids[end] == user_ids[start]:
+            end += 1
+        xs = [float(day - days[start]) for day in days[start:end]]
+        ys = [float(value) for value in values[start:end]]
+        n = len(ys)
+        mean_x, mean_y = sum(xs) / n, sum(ys) / n
+        sxx = sum((x - mean_x) ** 2 for x in xs)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx if sxx else 0.0
+        ema = ys[0]
+        for y in ys[1:]:
+            ema = alpha * y + (1 - alpha) * ema
+        volatility = math.sqrt(sum((y - mean_y) ** 2 for y in ys) / n)
+        trends[int(user_ids[start])] = (slope, ema, volatility)
+        start = end
+    return trends
+
+
+def main(users: int, entries: int):
+    from services.progress_trend_service import TREND_EMA_ALPHA, compute_trends
+
+    rng = np.random.default_rng(0)
+    counts = rng.integers(1, 2 * entries, size=users)
+    user_ids = np.repeat(np.arange(1, users + 1), counts)
+    offsets = np.concatenate([np.sort(rng.integers(0, 365 * 24, size=count)) for count in counts])
+    dates = np.datetime64("2024-01-01T00:00") + offsets.astype("timedelta64[h]")
+    values = rng.integers(0, 11, size=len(user_ids)).astype(np.float64)
+    print(f"users={users} entries={len(user_ids)}")
+
+    started = time.perf_counter()
+    expected = loop_trends(user_ids, dates, values, TREND_EMA_ALPHA)
+    loop_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    trends = compute_trends(user_ids, dates, values, TREND_EMA_ALPHA)
+    vectorized_time = time.perf_counter() - started
+
+    for user_id, slope, ema, volatility in zip(trends["user_id"], trends["slope_per_day"], trends["ema"], trends["volatility"]):
+        assert np.allclose((slope, ema, volatility), expected[int(user_id)], rtol=1e-6, atol=1e-6), user_id
+    print(f"per-user loop: {loop_time:7.2f} s")
+    print(f"vectorized:    {vectorized_time:7.2f} s")
+    print(f"speedup: {loop_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=30)
+    args = parser.parse_args()
+    main(args.users, args.entries)
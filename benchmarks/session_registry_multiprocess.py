@@ -0,0 +1,86 @@
+"""
+Multi-process check of the Redis session registry.
+
+Several worker processes race to start a conversation session for the same set
+of users, the way uvicorn workers behind a load balancer would. Every user must
+end up with exactly one active session that all processes agree on, and ending
+the session from any process must be seen by all of them.
+
+Needs a local Redis (REDIS_URL, default redis://localhost:6379/15). Run from
+the repository root:
+
+    python -m benchmarks.session_registry_multiprocess --workers 8 --users 500
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+
+# Far away from real user ids so the check never touches live sessions
+USER_ID_OFFSET = 10**9
+
+
+def claim_all(users: int, start_event, results):
+    from services.session_registry import claim_session
+
+    async def run():
+        claimed = await asyncio.gather(
+            *(claim_session(USER_ID_OFFSET + i, str(uuid.uuid4())) for i in range(users))
+        )
+        return dict(enumerate(claimed))
+
+    start_event.wait()
+    started = time.perf_counter()
+    claimed = asyncio.run(run())
+    results.put((os.getpid(), claimed, time.perf_counter() - started))
+
+
+async def end_all(users: int):
+    from services.session_registry import end_active_session, get_active_session
+
+    ended = await asyncio.gather(*(end_active_session(USER_ID_OFFSET + i) for i in range(users)))
+    remaining = await asyncio.gather(*(get_active_session(USER_ID_OFFSET + i) for i in range(users)))
+    return ended, remaining
+
+
+def main(workers: int, users: int):
+    ctx = multiprocessing.get_context("spawn")
+    start_event = ctx.Event()
+    results = ctx.Queue()
+    processes = [ctx.Process(target=claim_all, args=(users, start_event, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    time.sleep(1.0)  # Let every process finish importing before the race starts
+    start_event.set()
+
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    conflicts = 0
+    for i in range(users):
+        if len({claimed[i] for _, claimed, _ in outcomes}) != 1:
+            conflicts += 1
+
+    ended, remaining = asyncio.run(end_all(users))
+    agreed = sum(1 for i in range(users) if ended[i] == outcomes[0][1][i])
+
+    slowest = max(elapsed for _, _, elapsed in outcomes)
+    print(f"workers={workers} users={users} slowest worker={slowest:.3f}s")
+    print(f"users with conflicting sessions: {conflicts}")
+    print(f"sessions ended with the agreed id: {agreed}/{users}")
+    print(f"sessions still active after end: {sum(1 for r in remaining if r)}")
+    if conflicts or agreed != users or any(remaining):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+    main(args.workers, args.users)
@@ -0,0 +1,179 @@
+"""
+Multi-process check of Socket.IO emit delivery.
+
+Starts --workers uvicorn processes serving services.socket_service.sio, the
+way several app workers share one Redis, and connects --clients-per-worker
+Socket.IO clients to each of them. The check accepts clients without a token
+and registers two extra events on the server:
+
+  * local:  every client sends --messages pings and the worker answers each
+            with services.socket_service.reply. Every pong must arrive, and
+            none may go through the Redis channel.
+  * relay:  every client sends --messages messages addressed to a client
+            connected to another worker, emitted through the Redis manager.
+            Every target must receive exactly the messages sent to it.
+
+Messages published on the Socket.IO Redis channel are counted during each
+phase.
+
+Needs a local Redis (REDIS_URL, default redis://localhost:6379/15) and aiohttp
+for the Socket.IO clients. Run from the repository root:
+
+    python -m benchmarks.socket_emit_multiprocess --workers 4 --clients-per-worker 25
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+from collections import Counter
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+os.environ.setdefault("CEREBRAS_API_KEY", "benchmark-key")
+
+BASE_PORT = 18700
+
+
+def serve(port: int):
+    import socketio
+    import uvicorn
+    from services.socket_service import reply, sio
+
+    # The check's clients carry no token, so accept them without the auth handshake
+    @sio.on("connect")
+    async def bench_connect(sid, environ, auth):
+        return True
+
+    @sio.on("bench_ping")
+    async def bench_ping(sid, data):
+        await reply(sid, "bench_pong", data)
+
+    @sio.on("bench_relay")
+    async def bench_relay(sid, data):
+        await sio.emit("bench_relayed", data, to=data["to"])
+
+    uvicorn.run(socketio.ASGIApp(sio), host="127.0.0.1", port=port, log_level="warning")
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"Worker on port {port} did not start")
+
+
+async def count_channel_messages(counter: Counter, ready: asyncio.Event):
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(os.environ["REDIS_URL"])
+    pubsub = client.pubsub()
+    await pubsub.subscribe("socketio")
+    ready.set()
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                counter["published"] += 1
+    finally:
+        await pubsub.close()
+        await client.close()
+
+
+async def wait_until(condition, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return condition()
+
+
+async def run(workers: int, clients_per_worker: int, messages: int):
+    import socketio
+
+    channel = Counter()
+    ready = asyncio.Event()
+    listener = asyncio.create_task(count_channel_messages(channel, ready))
+    await ready.wait()
+
+    clients = []
+    received = []
+    for worker in range(workers):
+        for _ in range(clients_per_worker):
+            client = socketio.AsyncClient()
+            inbox = Counter()
+            client.on("bench_pong", lambda data, inbox=inbox: inbox.update(["pong"]))
+            client.on("bench_relayed", lambda data, inbox=inbox: inbox.update([data["from"]]))
+            await client.connect(f"http://127.0.0.1:{BASE_PORT + worker}", transports=["websocket"])
+            clients.append((worker, client))
+            received.append(inbox)
+    print(f"workers={workers} clients={len(clients)} messages/client={messages}")
+
+    # Local replies: nothing may be published
+    before = channel["published"]
+    started = time.perf_counter()
+    for _, client in clients:
+        for number in range(messages):
+            await client.emit("bench_ping", {"n": number})
+    local_ok = await wait_until(lambda: all(inbox["pong"] == messages for inbox in received))
+    local_time = time.perf_counter() - started
+    await asyncio.sleep(0.5)
+    local_published = channel["published"] - before
+    print(
+        f"local:  delivered={sum(inbox['pong'] for inbox in received)}/{len(clients) * messages} "
+        f"time={local_time:.3f}s published to Redis={local_published}"
+    )
+
+    # Cross-process: each client messages a client of the next worker
+    before = channel["published"]
+    started = time.perf_counter()
+    expected = Counter()
+    for index, (worker, client) in enumerate(clients):
+        target_index = (index + clients_per_worker) % len(clients)
+        target_worker, target = clients[target_index]
+        assert workers == 1 or target_worker != worker
+        for _ in range(messages):
+            await client.emit("bench_relay", {"to": target.get_sid(), "from": str(index)})
+        expected[(target_index, str(index))] += messages
+    relay_ok = await wait_until(
+        lambda: all(received[target][sender] == count for (target, sender), count in expected.items())
+    )
+    relay_time = time.perf_counter() - started
+    delivered = sum(received[target][sender] for target, sender in expected)
+    print(
+        f"relay:  delivered={delivered}/{len(clients) * messages} "
+        f"time={relay_time:.3f}s published to Redis={channel['published'] - before}"
+    )
+
+    for _, client in clients:
+        await client.disconnect()
+    listener.cancel()
+    if not (local_ok and relay_ok) or local_published:
+        raise SystemExit(1)
+
+
+def main(workers: int, clients_per_worker: int, messages: int):
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=serve, args=(BASE_PORT + worker,), daemon=True) for worker in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for worker in range(workers):
+            wait_for_port(BASE_PORT + worker)
+        asyncio.run(run(workers, clients_per_worker, messages))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients-per-worker", type=int, default=25)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+    main(args.workers, args.clients_per_worker, args.messages)
@@ -0,0 +1,76 @@
+"""
+Per-message authentication overhead benchmark.
+
+Compares, for one access token validated on every socket message:
+
+  * previous: JWT decode plus separate Redis GET and TTL round-trips.
+  * cold:     services.auth_service.validate_access_token on a cache miss
+              (JWT decode plus one pipelined round-trip).
+  * cached:   validate_access_token on a cache hit.
+
+It also measures how long a revocation published by another worker takes to
+evict the token from this worker's cache.
+
+Needs a local Redis (REDIS_URL, default redis://localhost:6379/15). Run from
+the repository root:
+
+    python -m benchmarks.token_auth --messages 20000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+
+def per_call_us(fn, calls: int):
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main(messages: int):
+    from jose import jwt
+    from services import auth_service
+    from services.redis_service import redis_client
+
+    token = auth_service.create_access_token({"sub": "benchmark-user", "uid": 1})
+
+    def previous():
+        jwt.decode(token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM])
+        redis_client.get(token)
+        redis_client.ttl(token)
+
+    def cold():
+        auth_service.evict_cached_token(token)
+        auth_service.validate_access_token(token)
+
+    def cached():
+        auth_service.validate_access_token(token)
+
+    print(f"messages={messages}")
+    print(f"previous (decode + GET + TTL): {per_call_us(previous, messages):8.1f} us/message")
+    print(f"cache miss (decode + pipeline): {per_call_us(cold, messages):7.1f} us/message")
+    auth_service.validate_access_token(token)
+    print(f"cache hit:                      {per_call_us(cached, messages):7.1f} us/message")
+
+    auth_service.start_revocation_listener()
+    time.sleep(0.5)  # Let the subscription become active
+    auth_service.validate_access_token(token)
+    published = time.perf_counter()
+    # Publish as another worker would, without touching this worker's cache directly
+    redis_client.delete(token)
+    redis_client.publish(auth_service.TOKEN_REVOCATION_CHANNEL, token)
+    while auth_service._get_cached_token(token) is not None:
+        time.sleep(0.0005)
+    print(f"revocation visible after {(time.perf_counter() - published) * 1e3:.1f} ms")
+    auth_service.stop_revocation_listener()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.messages)
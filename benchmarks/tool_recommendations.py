@@ -0,0 +1,84 @@
+"""
+Tool recommendation index benchmark.
+
+Generates --interactions synthetic (user, tool) interactions over --users users
+and --tools tools (Zipf-like tool popularity, users with a few preferred
+categories), then measures:
+
+  * build: services.tool_recommendation_service.build_neighbor_index, the
+           sparse co-occurrence matrix and top-k neighbour lists.
+  * serve: score_candidates for sampled users from the in-memory neighbour
+           lists, i.e. the work of one recommendation request after its two
+           indexed reads.
+
+No database is needed. Run from the repository root:
+
+    python -m benchmarks.tool_recommendations --interactions 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+from collections import defaultdict
+
+import numpy as np
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+
+
+def synthetic_interactions(interactions: int, users: int, tools: int, rng):
+    categories = 20
+    popularity = 1 / np.arange(1, tools + 1)
+    tool_category = rng.integers(0, categories, size=tools)
+    user_ids = rng.integers(1, users + 1, size=interactions)
+    # Each user mostly picks tools from their own category
+    preferred = (user_ids * 7919) % categories
+    same_category = rng.random(interactions) < 0.7
+    tool_ids = np.empty(interactions, dtype=np.int64)
+    by_category = [np.flatnonzero(tool_category == category) + 1 for category in range(categories)]
+    weights = [popularity[members - 1] / popularity[members - 1].sum() for members in by_category]
+    for category in range(categories):
+        mask = same_category & (preferred == category)
+        tool_ids[mask] = rng.choice(by_category[category], size=mask.sum(), p=weights[category])
+    tool_ids[~same_category] = rng.choice(np.arange(1, tools + 1), size=(~same_category).sum(), p=popularity / popularity.sum())
+    return user_ids, tool_ids
+
+
+def main(interactions: int, users: int, tools: int, k: int, samples: int):
+    from services.tool_recommendation_service import TOOL_RECOMMENDATION_RECENT_TOOLS, build_neighbor_index, score_candidates
+
+    rng = np.random.default_rng(0)
+    user_ids, tool_ids = synthetic_interactions(interactions, users, tools, rng)
+    print(f"interactions={interactions} users={users} tools={tools} k={k}")
+
+    started = time.perf_counter()
+    cooccurrence, (rows, cols, scores) = build_neighbor_index(user_ids, tool_ids, k)
+    print(f"build: {time.perf_counter() - started:.2f}s, {cooccurrence.nnz} co-occurrence pairs, {len(rows)} neighbours")
+
+    neighbor_lists = defaultdict(list)
+    for tool_id, neighbor_id, score in zip(rows.tolist(), cols.tolist(), scores.tolist()):
+        neighbor_lists[tool_id].append((neighbor_id, score))
+    history = defaultdict(list)
+    for user_id, tool_id in zip(user_ids.tolist(), tool_ids.tolist()):
+        history[user_id].append(tool_id)
+
+    latencies = []
+    for user_id in rng.choice(list(history), size=samples):
+        used = list(dict.fromkeys(reversed(history[user_id])))
+        started = time.perf_counter()
+        score_candidates(neighbor_lists, used[:TOOL_RECOMMENDATION_RECENT_TOOLS], set(used), 10)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    print(f"serve: p50={statistics.median(latencies):.1f} us p99={latencies[int(len(latencies) * 0.99)]:.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactions", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--tools", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.interactions, args.users, args.tools, args.k, args.samples)
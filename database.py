@@ -1,17 +1,215 @@
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+def to_async_url(url: str):
+    """
+    Derive the asyncpg URL from a synchronous PostgreSQL URL.
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Connection pool settings, applied to the sync and the async engine alike
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+class PoolStats:
+    """
+    Counters for one engine's connection pool, updated from pool events.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.in_use = 0
+        self.in_use_peak = 0
+        self.connects = 0
+        self.invalidated = 0
+
+    def record_wait(self, seconds: float, timed_out: bool):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.checkout_wait_seconds_total += seconds
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, seconds)
+
+    def record_checkout(self):
+        with self._lock:
+            self.in_use += 1
+            self.in_use_peak = max(self.in_use_peak, self.in_use)
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidated(self):
+        with self._lock:
+            self.invalidated += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checked_out": pool.checkedout(),
+                "overflow": max(0, pool.overflow()),
+                "idle": pool.checkedin(),
+                "in_use": self.in_use,
+                "in_use_peak": self.in_use_peak,
+                "checkouts": self.checkouts,
+                "avg_checkout_wait_ms": self.checkout_wait_seconds_total / self.checkouts * 1000 if self.checkouts else None,
+                "max_checkout_wait_ms": self.checkout_wait_seconds_max * 1000,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidated": self.invalidated,
+            }
+
+class InstrumentedPoolMixin:
+    """
+    Times how long each checkout waits for a free connection.
+    """
+
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started, timed_out=False)
+        return connection
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    stats = PoolStats()
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    stats = PoolStats()
+
+def pool_options():
+    """
+    Engine keyword arguments for the configured pool.
+    """
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# Query count and time of the HTTP request being served, set by QueryStatsMiddleware
+current_query_stats = ContextVar("current_query_stats", default=None)
+
+class RequestQueryTotals:
+    """
+    Per-request query counts aggregated across all served requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.max_queries = 0
+        self.max_query_seconds = 0.0
+
+    def record(self, stats: dict):
+        with self._lock:
+            self.requests += 1
+            self.queries += stats["queries"]
+            self.query_seconds += stats["seconds"]
+            self.max_queries = max(self.max_queries, stats["queries"])
+            self.max_query_seconds = max(self.max_query_seconds, stats["seconds"])
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "avg_queries_per_request": self.queries / self.requests if self.requests else None,
+                "avg_query_ms_per_request": self.query_seconds / self.requests * 1000 if self.requests else None,
+                "max_queries_per_request": self.max_queries,
+                "max_query_ms_per_request": self.max_query_seconds * 1000,
+            }
+
+request_query_totals = RequestQueryTotals()
+
+def instrument_engine(sync_engine, stats: PoolStats):
+    """
+    Attach the pool and query event hooks to an engine.
+
+    Args:
+        sync_engine: The Engine, or the sync_engine of an AsyncEngine.
+        stats (PoolStats): The counters of the engine's pool.
+    """
+    @event.listens_for(sync_engine.pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.record_connect()
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.record_checkout()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.record_checkin()
+
+    # Covers connections found stale by pre-ping as well as ones lost mid-query
+    @event.listens_for(sync_engine.pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.record_invalidated()
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_started
+        query_stats = current_query_stats.get()
+        if query_stats is not None:
+            query_stats["queries"] += 1
+            query_stats["seconds"] += elapsed
+
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **pool_options())
+instrument_engine(engine, InstrumentedQueuePool.stats)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for code running on the event loop (Socket.IO handlers, background tasks)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **pool_options())
+instrument_engine(async_engine.sync_engine, InstrumentedAsyncQueuePool.stats)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     """
     Dependency to get the database session.
@@ -20,4 +218,60 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    Dependency to get an async database session.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware counting the queries and query time of each HTTP request.
+
+    The totals are reported as X-DB-Queries and X-DB-Query-Time-Ms response
+    headers and aggregated into request_query_totals.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # A mutable dict, so updates made in threadpool copies of the context are seen here
+        query_stats = {"queries": 0, "seconds": 0.0}
+        token = current_query_stats.set(query_stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-db-queries", str(query_stats["queries"]).encode()),
+                    (b"x-db-query-time-ms", f"{query_stats['seconds'] * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+            request_query_totals.record(query_stats)
+
+def database_metrics():
+    """
+    Get a snapshot of the connection pool and per-request query metrics.
+
+    Returns:
+        dict: Pool settings and counters for each engine, and request query totals.
+    """
+    return {
+        "settings": pool_options(),
+        "sync_pool": InstrumentedQueuePool.stats.snapshot(engine.pool),
+        "async_pool": InstrumentedAsyncQueuePool.stats.snapshot(async_engine.pool),
+        "requests": request_query_totals.snapshot(),
+    }
@@ -1,17 +1,28 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 # from pydantic import BaseModel
 # from sqlalchemy.orm import Session
 # from services.auth_service import User, authenticate_user, create_access_token, register_user, validate_access_token
 # from services.ai_service import get_answer, process_audio_to_text
 # from services.notification_service import generate_notifications
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth_router, progress_router, subscription_router, tool_router, blog_router
+from routers import auth_router, progress_router, subscription_router, tool_router, blog_router, metrics_router
 import socketio
-from database import Base, engine
+from database import Base, engine, QueryStatsMiddleware
+from migrations import upgrade_schema
 from services.socket_service import sio
+from services.ai_service import close_ai_client
+from services.history_writer import history_writer
+from services.speech_service import shutdown_speech_pool
+from services.blog_view_service import start_view_flusher, stop_view_flusher
+from services.tool_catalog_service import tool_catalog
+from services.tool_recommendation_service import start_neighbor_refresher, stop_neighbor_refresher
+from services.subscription_quota_service import start_quota_reconciler, stop_quota_reconciler
+from services.subscription_billing_service import start_billing_sweeper, stop_billing_sweeper
+from services.auth_service import start_revocation_listener, stop_revocation_listener, shutdown_hash_executor
 
-# Initialize FastAPI app
-app = FastAPI()
+# Initialize FastAPI app, encoding JSON responses with orjson
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Enable CORS
 app.add_middleware(
@@ -20,24 +31,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],  # Lets browsers read pagination cursors
 )
 
+# Count the queries and query time of each request
+app.add_middleware(QueryStatsMiddleware)
+
 # Include routers
 app.include_router(auth_router.router, prefix="/auth", tags=["auth"])
 app.include_router(progress_router.router, prefix="/progress", tags=["progress"])
 app.include_router(subscription_router.router, prefix="/subscriptions", tags=["subscriptions"])
 app.include_router(tool_router.router, prefix="/tools", tags=["tools"])
 app.include_router(blog_router.router, prefix="/blog", tags=["blog"])
+app.include_router(metrics_router.router, prefix="/metrics", tags=["metrics"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Therapy App"}
 
+@app.on_event("startup")
+async def startup():
+    await history_writer.start()
+    start_revocation_listener()
+    start_view_flusher()
+    tool_catalog.start_listener()
+    start_neighbor_refresher()
+    start_quota_reconciler()
+    start_billing_sweeper()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Persist queued conversation history before the process exits
+    await history_writer.stop()
+    await stop_view_flusher()
+    await stop_neighbor_refresher()
+    await stop_quota_reconciler()
+    await stop_billing_sweeper()
+    await close_ai_client()
+    shutdown_speech_pool()
+    stop_revocation_listener()
+    tool_catalog.stop_listener()
+    shutdown_hash_executor()
+
 # Initialize Socket.IO server
 app = socketio.ASGIApp(sio, app)
 
 # Initialize database
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 # --- Run with Socket.IO & FastAPI (using Uvicorn) ---
 if __name__ == "__main__":
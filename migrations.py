@@ -0,0 +1,26 @@
+from sqlalchemy import text
+from models.blog_post import BLOG_SEARCH_VECTOR_SQL
+
+# Base.metadata.create_all only creates missing tables, so columns and indexes
+# added to existing tables are listed here as idempotent DDL run on startup.
+SCHEMA_UPGRADES = [
+    "ALTER TABLE conv_sessions ADD COLUMN IF NOT EXISTS summary TEXT",
+    "ALTER TABLE conv_sessions ADD COLUMN IF NOT EXISTS summarized_until_id INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_history_session_id_id ON conversation_history (session_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_progress_tracking_user_id_date_id ON progress_tracking (user_id, date, id)",
+    "ALTER TABLE progress_tracking ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_progress_tracking_user_id_idempotency_key ON progress_tracking (user_id, idempotency_key)",
+    f"ALTER TABLE blog_posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({BLOG_SEARCH_VECTOR_SQL}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_blog_posts_search_vector ON blog_posts USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_tools_category ON tools (category)",
+    "CREATE INDEX IF NOT EXISTS ix_user_tools_user_id_interaction_date_id ON user_tools (user_id, interaction_date DESC NULLS LAST, id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_subscriptions_is_active_next_billing_date ON subscriptions (is_active, next_billing_date, id)",
+]
+
+def upgrade_schema(engine):
+    """
+    Apply the idempotent schema upgrades.
+    """
+    with engine.begin() as conn:
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(text(statement))
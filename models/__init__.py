@@ -3,4 +3,10 @@ from .subscription import Subscription
 from .conv_session import ConvSession
 from .tool import Tool
 from .user_tool import UserTool
-from .progress import Progress
\ No newline at end of file
+from .progress import Progress
+from .progress_stats import UserProgressStats
+from .progress_rollup import ProgressRollup
+from .progress_trend import ProgressTrend
+from .tool_usage_stats import ToolUsageStats
+from .tool_cooccurrence import ToolCooccurrence
+from .tool_neighbor import ToolNeighbor
@@ -1,9 +1,24 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Computed, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from database import Base
 from datetime import datetime
 
+# Text search document: the title ranks above the overlay text, which ranks above the body
+BLOG_SEARCH_CONFIG = "english"
+BLOG_SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{BLOG_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{BLOG_SEARCH_CONFIG}', coalesce(\"overlayText\", '')), 'B') || "
+    f"setweight(to_tsvector('{BLOG_SEARCH_CONFIG}', coalesce(\"newsText\", '') || ' ' || coalesce(\"detailText\", '')), 'C')"
+)
+# The columns indexed by BLOG_SEARCH_VECTOR_SQL, in document order; snippets are built from the same text
+BLOG_SEARCH_COLUMNS = ("title", "overlayText", "newsText", "detailText")
+
 class BlogPost(Base):
     __tablename__ = "blog_posts"
+    __table_args__ = (
+        Index('ix_blog_posts_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -15,4 +30,6 @@ class BlogPost(Base):
     detailedImage2 = Column(String)
     newsText = Column(Text)
     overlayText = Column(Text)
-    detailText = Column(Text)
\ No newline at end of file
+    detailText = Column(Text)
+    # Maintained by PostgreSQL and only used in queries, so never loaded with the post
+    search_vector = deferred(Column(TSVECTOR, Computed(BLOG_SEARCH_VECTOR_SQL, persisted=True)))
\ No newline at end of file
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+from datetime import datetime
+
+class BlogViewFlush(Base):
+    __tablename__ = 'blog_view_flushes'
+    batch_id = Column(String, primary_key=True)  # Id of a view batch written to blog_posts
+    flushed_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Boolean, TIMESTAMP
+from sqlalchemy import Column, Integer, ForeignKey, Boolean, TIMESTAMP, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -13,6 +13,8 @@ class ConvSession(Base):
     start_time = Column(TIMESTAMP, default=datetime.utcnow)
     end_time = Column(TIMESTAMP, nullable=True)
     is_completed = Column(Boolean, default=False)
+    summary = Column(Text, nullable=True)  # Rolling summary of turns that left the context window
+    summarized_until_id = Column(Integer, nullable=True)  # Last conversation_history.id folded into summary
 
     user = relationship("User", back_populates="sessions")
     conversation_history = relationship("ConversationHistory", back_populates="conv_session")
\ No newline at end of file
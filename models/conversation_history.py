@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from database import Base
@@ -6,6 +6,9 @@ from datetime import datetime
 
 class ConversationHistory(Base):
     __tablename__ = 'conversation_history'
+    __table_args__ = (
+        Index('ix_conversation_history_session_id_id', 'session_id', 'id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(UUID(as_uuid=True), ForeignKey('conv_sessions.session_id'), nullable=False)
     role = Column(String, nullable=False)  # 'user' or 'assistant'
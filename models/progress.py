@@ -1,14 +1,19 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
 class Progress(Base):
     __tablename__ = 'progress_tracking'
+    __table_args__ = (
+        Index('ix_progress_tracking_user_id_date_id', 'user_id', 'date', 'id'),
+        Index('ux_progress_tracking_user_id_idempotency_key', 'user_id', 'idempotency_key', unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     date = Column(DateTime)
     stress_level = Column(Integer)
     negative_thoughts_reduction = Column(Integer)
     positive_thoughts_increase = Column(Integer)
+    idempotency_key = Column(String)  # Client-supplied key deduplicating bulk sync replays
 
     user = relationship("User", back_populates="progress")
\ No newline at end of file
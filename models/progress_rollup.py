@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey
+from database import Base
+
+class ProgressRollup(Base):
+    __tablename__ = 'progress_rollups'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    period = Column(String, primary_key=True)  # 'week' or 'month'
+    period_start = Column(DateTime, primary_key=True)
+    entry_count = Column(Integer, default=0)
+    stress_level_count = Column(Integer, default=0)
+    stress_level_sum = Column(Float)
+    stress_level_min = Column(Integer)
+    stress_level_max = Column(Integer)
+    negative_thoughts_reduction_count = Column(Integer, default=0)
+    negative_thoughts_reduction_sum = Column(Float)
+    negative_thoughts_reduction_min = Column(Integer)
+    negative_thoughts_reduction_max = Column(Integer)
+    positive_thoughts_increase_count = Column(Integer, default=0)
+    positive_thoughts_increase_sum = Column(Float)
+    positive_thoughts_increase_min = Column(Integer)
+    positive_thoughts_increase_max = Column(Integer)
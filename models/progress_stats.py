@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, DateTime, Float, ForeignKey
+from database import Base
+
+class UserProgressStats(Base):
+    __tablename__ = 'user_progress_stats'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    initial_stress_level = Column(Integer)
+    initial_date = Column(DateTime)
+    latest_stress_level = Column(Integer)
+    latest_date = Column(DateTime)
+    entry_count = Column(Integer, default=0)
+    mean_stress_level = Column(Float)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey
+from database import Base
+
+class ProgressTrend(Base):
+    __tablename__ = 'progress_trends'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    metric = Column(String, primary_key=True)  # A Progress metric column name
+    entry_count = Column(Integer)
+    slope_per_day = Column(Float)
+    ema = Column(Float)
+    volatility = Column(Float)
+    last_entry_date = Column(DateTime)
+    computed_at = Column(DateTime)
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
 class Subscription(Base):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        # Walked in (next_billing_date, id) order by the billing sweeper
+        Index('ix_subscriptions_is_active_next_billing_date', 'is_active', 'next_billing_date', 'id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     subscription_type = Column(String)  # 'pack_of_4' or 'unlimited'
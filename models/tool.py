@@ -7,7 +7,7 @@ class Tool(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(Text)
-    category = Column(String)  # e.g., 'gratitude_journal', 'breathing_technique', etc.
+    category = Column(String, index=True)  # e.g., 'gratitude_journal', 'breathing_technique', etc.
     content = Column(Text)  # This can store the actual content or a link to the content
 
     user_tools = relationship("UserTool", back_populates="tool")
\ No newline at end of file
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from database import Base
+
+class ToolCooccurrence(Base):
+    __tablename__ = 'tool_cooccurrence'
+    tool_id = Column(Integer, ForeignKey('tools.id'), primary_key=True)
+    other_tool_id = Column(Integer, ForeignKey('tools.id'), primary_key=True)
+    user_count = Column(Integer, default=0)  # Users who used both tools; the tool's own users when other_tool_id == tool_id
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from database import Base
+
+class ToolNeighbor(Base):
+    __tablename__ = 'tool_neighbors'
+    tool_id = Column(Integer, ForeignKey('tools.id'), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey('tools.id'), primary_key=True)
+    score = Column(Float)  # Cosine similarity of the tools' user sets
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from database import Base
+
+class ToolUsageStats(Base):
+    __tablename__ = 'tool_usage_stats'
+    tool_id = Column(Integer, ForeignKey('tools.id'), primary_key=True)
+    interaction_count = Column(Integer, default=0)
+    last_interaction_at = Column(DateTime)
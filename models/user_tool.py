@@ -1,13 +1,22 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from database import Base
+from datetime import datetime
 
 class UserTool(Base):
     __tablename__ = 'user_tools'
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     tool_id = Column(Integer, ForeignKey('tools.id'))
-    interaction_date = Column(DateTime)
+    interaction_date = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="user_tools")
-    tool = relationship("Tool", back_populates="user_tools")
\ No newline at end of file
+    tool = relationship("Tool", back_populates="user_tools")
+
+# Matches the newest-first order of a user's interaction history
+Index(
+    'ix_user_tools_user_id_interaction_date_id',
+    UserTool.user_id,
+    UserTool.interaction_date.desc().nulls_last(),
+    UserTool.id.desc(),
+)
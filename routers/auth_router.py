@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from services.auth_service import authenticate_user, create_access_token, register_user
+from services.auth_service import authenticate_user, create_access_token, register_user, revoke_access_token
 from database import get_db
 
 router = APIRouter()
@@ -22,25 +23,34 @@ class Token(BaseModel):
     user_id: int
 
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_db)):
     print("user data", user)
-    db_user = authenticate_user(db, username=user.username, password=user.password)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    message =  register_user(db=db, username=user.username, password=user.password, email=user.email)
+    # register_user rejects taken usernames with a cheap existence check, no password verify
+    message = await register_user(db=db, username=user.username, password=user.password, email=user.email)
     print("register message", message)
     if message["msg"] == "User registered successfully":
-        access_token = create_access_token(data={"sub": user.username})
+        access_token = await run_in_threadpool(create_access_token, {"sub": user.username, "uid": message["user_id"]})
     return {"access_token": access_token, "token_type": "bearer", "user_id": message["user_id"], "user_name": message["user_name"]}
 
 @router.post("/token", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: Session = Depends(get_db)):
     print("user data", user)
-    db_user = authenticate_user(db, username=user.username, password=user.password)
+    db_user = await authenticate_user(db, username=user.username, password=user.password)
     if not db_user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    access_token = create_access_token(data={"sub": db_user.username})
+    access_token = await run_in_threadpool(create_access_token, {"sub": db_user.username, "uid": db_user.id})
     print("login message:")
     print(db_user)
     print(db_user.username, db_user.id)
-    return {"access_token": access_token, "token_type": "bearer", "user_id": db_user.id, "user_name": db_user.username}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer", "user_id": db_user.id, "user_name": db_user.username}
+
+@router.post("/logout")
+def logout(authorization: str = Header(...)):
+    """
+    Revoke the bearer token on every worker.
+    """
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    revoke_access_token(token)
+    return {"msg": "Logged out successfully"}
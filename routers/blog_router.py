@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+import orjson
 from pydantic import BaseModel
 from database import get_db
+from models.blog_post import BlogPost as BlogPostModel
+from services.blog_cache_service import cached_body, invalidate_blog_cache
+from services.http_cache_service import etag_response
+from services.blog_view_service import current_views, forget_views, pending_views, record_view
+from services.blog_search_service import search_posts
 
 
 router = APIRouter()
@@ -27,25 +35,89 @@ class BlogPost(BlogPostBase):
     class Config:
         orm_mode = True
 
+class BlogPostSummary(BaseModel):
+    id: int
+    title: str
+    author: str
+    date: str
+    views: int
+    mainImage: str
+
+    class Config:
+        orm_mode = True
+
+class BlogSearchResult(BlogPostSummary):
+    rank: float
+    snippet: str
+
 
 # API to create a new blog post
 @router.post("/posts/", response_model=BlogPost)
 def create_blog_post(post: BlogPostCreate, db: Session = Depends(get_db)):
     return create_blog_post(db=db, post=post)
 
-# API to get a blog post by ID
-@router.get("/posts/{post_id}", response_model=BlogPost)
-def get_blog_post(post_id: int, db: Session = Depends(get_db)):
-    db_post = get_blog_post(db=db, post_id=post_id)
-    if db_post is None:
+def with_views(body: bytes, db: Session):
+    """
+    Fill in the current view counts of a cached post or list of posts.
+
+    Cached bodies leave views out, so counting views never invalidates them.
+    """
+    data = orjson.loads(body)
+    posts = data if isinstance(data, list) else [data]
+    views = current_views(db, [post["id"] for post in posts])
+    for post in posts:
+        post["views"] = views[post["id"]]
+    return orjson.dumps(data)
+
+def cached_post_body(post_id: int, db: Session):
+    def load():
+        db_post = get_blog_post(db=db, post_id=post_id)
+        return None if db_post is None else BlogPost.from_orm(db_post).json(exclude={"views"}).encode()
+
+    body = cached_body(f"post:{post_id}", load)
+    if body is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return db_post
+    return body
 
-# API to get all blog posts
-@router.get("/posts/", response_model=list[BlogPost])
-def get_blog_posts(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    posts = get_blog_posts(db=db, skip=skip, limit=limit)
-    return posts
+# API to get a blog post by ID
+@router.get("/posts/{post_id}", response_model=BlogPost)
+def get_blog_post(post_id: int, request: Request, db: Session = Depends(get_db)):
+    return etag_response(request, with_views(cached_post_body(post_id, db), db))
+
+# API to count a view of a blog post
+@router.post("/posts/{post_id}/view")
+def view_blog_post(post_id: int, db: Session = Depends(get_db)):
+    cached_post_body(post_id, db)  # 404 for unknown posts
+    record_view(post_id)
+    return {"id": post_id, "views": current_views(db, [post_id])[post_id]}
+
+# API to get a page of blog post summaries (without the text columns)
+@router.get("/posts/", response_model=list[BlogPostSummary])
+def get_blog_posts(request: Request, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+    def load():
+        posts = get_blog_posts(db=db, skip=skip, limit=limit)
+        return orjson.dumps([{field: value for field, value in post._asdict().items() if field != "views"} for post in posts])
+
+    return etag_response(request, with_views(cached_body(f"posts:{skip}:{limit}", load), db))
+
+# API to search blog posts by their text, best match first
+@router.get("/search", response_model=list[BlogSearchResult])
+def search_blog_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        rows, next_cursor = search_posts(db, q, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    pending = pending_views([row.id for row in rows])
+    return ORJSONResponse(
+        [{**row._asdict(), "views": (row.views or 0) + pending[row.id]} for row in rows],
+        headers=headers,
+    )
 
 # API to update a blog post
 @router.put("/posts/{post_id}", response_model=BlogPost)
@@ -64,7 +136,7 @@ def delete_blog_post(post_id: int, db: Session = Depends(get_db)):
     return db_post
 
 def create_blog_post(db: Session, post: BlogPostCreate):
-    db_post = BlogPost(
+    db_post = BlogPostModel(
         title=post.title,
         author=post.author,
         date=post.date,
@@ -78,20 +150,27 @@ def create_blog_post(db: Session, post: BlogPostCreate):
     )
     db.add(db_post)
     db.commit()
+    invalidate_blog_cache()
     db.refresh(db_post)
     return db_post
 
 # Get a blog post by ID
 def get_blog_post(db: Session, post_id: int):
-    return db.query(BlogPost).filter(BlogPost.id == post_id).first()
+    return db.query(BlogPostModel).filter(BlogPostModel.id == post_id).first()
 
-# Get all blog posts
+# Get a page of blog posts as rows of the summary columns
 def get_blog_posts(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(BlogPost).offset(skip).limit(limit).all()
+    return (
+        db.query(*(getattr(BlogPostModel, field) for field in BlogPostSummary.__fields__))
+        .order_by(BlogPostModel.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
 
 # Update a blog post
 def update_blog_post(db: Session, post_id: int, post: BlogPostCreate):
-    db_post = db.query(BlogPost).filter(BlogPost.id == post_id).first()
+    db_post = db.query(BlogPostModel).filter(BlogPostModel.id == post_id).first()
     if db_post:
         db_post.title = post.title
         db_post.author = post.author
@@ -104,15 +183,19 @@ def update_blog_post(db: Session, post_id: int, post: BlogPostCreate):
         db_post.overlayText = post.overlayText
         db_post.detailText = post.detailText
         db.commit()
+        invalidate_blog_cache()
+        forget_views(post_id)
         db.refresh(db_post)
         return db_post
     return None
 
 # Delete a blog post
 def delete_blog_post(db: Session, post_id: int):
-    db_post = db.query(BlogPost).filter(BlogPost.id == post_id).first()
+    db_post = db.query(BlogPostModel).filter(BlogPostModel.id == post_id).first()
     if db_post:
         db.delete(db_post)
         db.commit()
+        invalidate_blog_cache()
+        forget_views(post_id)
         return db_post
     return None
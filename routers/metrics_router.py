@@ -0,0 +1,34 @@
+import os
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException
+from database import database_metrics
+from services.speech_service import speech_metrics
+
+# Internal metrics access; the endpoints are closed while no token is configured
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+def require_metrics_token(x_metrics_token: str = Header(None)):
+    """
+    Allow only callers presenting METRICS_TOKEN in the X-Metrics-Token header.
+
+    Raises:
+        HTTPException: 403 if the token is missing or wrong, or none is configured.
+    """
+    if not METRICS_TOKEN or not x_metrics_token or not secrets.compare_digest(x_metrics_token, METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+router = APIRouter(dependencies=[Depends(require_metrics_token)])
+
+@router.get("/speech")
+def get_speech_metrics():
+    """
+    Get the speech-to-text worker pool metrics.
+    """
+    return speech_metrics()
+
+@router.get("/db")
+def get_database_metrics():
+    """
+    Get the database connection pool and per-request query metrics.
+    """
+    return database_metrics()
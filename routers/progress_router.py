@@ -1,12 +1,24 @@
-from fastapi import APIRouter, Depends
+import base64
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from datetime import datetime
 from pydantic import BaseModel
 from database import get_db
 from models.progress import Progress
+from services.progress_stats_service import record_progress
+from services.progress_rollup_service import get_rollups
+from services.progress_bulk_service import PROGRESS_BULK_MAX_ENTRIES, ingest_progress_bulk
 
 router = APIRouter()
 
+# Page size limits for progress history
+PROGRESS_PAGE_SIZE = int(os.getenv("PROGRESS_PAGE_SIZE", "100"))
+PROGRESS_MAX_PAGE_SIZE = int(os.getenv("PROGRESS_MAX_PAGE_SIZE", "500"))
+
 class ProgressCreate(BaseModel):
     user_id: int
     date: str
@@ -14,6 +26,27 @@ class ProgressCreate(BaseModel):
     negative_thoughts_reduction: int
     positive_thoughts_increase: int
 
+class ProgressBulkRequest(BaseModel):
+    entries: list[dict]
+
+class ProgressBulkResult(BaseModel):
+    index: int
+    status: str  # 'created', 'duplicate' or 'invalid'
+    id: Optional[int]
+    errors: Optional[list[dict]]
+
+class MetricSummary(BaseModel):
+    avg: Optional[float]
+    min: Optional[int]
+    max: Optional[int]
+
+class ProgressReportEntry(BaseModel):
+    period_start: datetime
+    entry_count: int
+    stress_level: MetricSummary
+    negative_thoughts_reduction: MetricSummary
+    positive_thoughts_increase: MetricSummary
+
 class ProgressResponse(BaseModel):
     id: int
     user_id: int
@@ -32,23 +65,91 @@ def create_progress(progress: ProgressCreate, db: Session = Depends(get_db)):
     """
     db_progress = Progress(**progress.dict())
     db.add(db_progress)
+    db.flush()
+    db.refresh(db_progress)
+    record_progress(db, db_progress)
     db.commit()
     db.refresh(db_progress)
     return db_progress
 
+@router.post("/bulk", response_model=list[ProgressBulkResult], response_model_exclude_none=True)
+def create_progress_bulk(request: ProgressBulkRequest, db: Session = Depends(get_db)):
+    """
+    Create many progress entries at once, e.g. when an offline client syncs.
+
+    Every entry needs an idempotency_key, unique per user, so that replaying a
+    sync does not create the entries twice. Entries are validated one by one
+    and the response reports each entry's status in request order.
+    """
+    if len(request.entries) > PROGRESS_BULK_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"At most {PROGRESS_BULK_MAX_ENTRIES} entries per request")
+    return ingest_progress_bulk(db, request.entries)
+
+def encode_cursor(progress):
+    """
+    Encode the (date, id) position of a progress entry or row as an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(f"{progress.date.isoformat()}|{progress.id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    try:
+        date, progress_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(date), int(progress_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/get/{user_id}", response_model=list[ProgressResponse])
-def get_progress(user_id: int, db: Session = Depends(get_db)):
+def get_progress(
+    user_id: int,
+    limit: int = Query(PROGRESS_PAGE_SIZE, ge=1, le=PROGRESS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+):
     """
-    Get all progress entries for a user.
+    Get a page of progress entries for a user, newest first.
+
+    Entries can be limited to a date range with the from (inclusive) and to
+    (exclusive) parameters. When more entries exist, the X-Next-Cursor response
+    header holds the cursor for the next page.
+
+    Only the ProgressResponse columns are selected, and the rows are encoded
+    as they are, without building an ORM object and a model per entry.
     """
     print(user_id)
-    return db.query(Progress).filter(Progress.user_id == user_id).all()
-
-# @router.get("/progress_report/{user_id}", response_model=list[ProgressResponse])
-# def get_weekly_progress_report(user_id: int, db: Session = Depends(get_db)):
-#     """
-#     Get the weekly progress report for a user.
-#     """
-#     from datetime import datetime, timedelta
-#     one_week_ago = datetime.now() - timedelta(days=7)
-#     return db.query(Progress).filter(Progress.user_id == user_id, Progress.date >= one_week_ago).all()
\ No newline at end of file
+    columns = [getattr(Progress, field) for field in ProgressResponse.__fields__]
+    query = db.query(*columns).filter(Progress.user_id == user_id, Progress.date.isnot(None))
+    if date_from is not None:
+        query = query.filter(Progress.date >= date_from)
+    if date_to is not None:
+        query = query.filter(Progress.date < date_to)
+    if cursor:
+        # Row comparison keeps this a range scan on the (user_id, date, id) index
+        query = query.filter(tuple_(Progress.date, Progress.id) < decode_cursor(cursor))
+
+    # Fetch one extra row to know whether another page follows
+    entries = query.order_by(Progress.date.desc(), Progress.id.desc()).limit(limit + 1).all()
+    headers = {}
+    if len(entries) > limit:
+        entries = entries[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(entries[-1])
+    return ORJSONResponse([entry._asdict() for entry in entries], headers=headers)
+
+@router.get("/report/{user_id}", response_model=list[ProgressReportEntry])
+def get_progress_report(
+    user_id: int,
+    period: str = Query("week", regex="^(week|month)$"),
+    limit: int = Query(12, ge=1, le=120),
+    db: Session = Depends(get_db),
+):
+    """
+    Get a user's weekly or monthly progress report, newest period first.
+    """
+    return get_rollups(db, user_id, period, limit)
@@ -3,8 +3,11 @@ from sqlalchemy.orm import Session
 from models.subscription import Subscription
 from models.user import User
 from database import get_db
+from services.subscription_billing_service import next_billing_date
+from services.subscription_quota_service import SESSION_QUOTAS, current_subscription, live_sessions_used, quota_limit, reset_quotas
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter()
 
@@ -19,6 +22,7 @@ class SubscriptionResponse(BaseModel):
     sessions_used: int
     next_billing_date: datetime
     is_active: bool
+    sessions_limit: Optional[int] = None  # Sessions per billing cycle, None if unlimited
 
     class Config:
         orm_mode = True
@@ -29,16 +33,25 @@ def create_subscription(subscription: SubscriptionCreate, db: Session = Depends(
     db_user = db.query(User).filter(User.id == subscription.user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    if subscription.subscription_type not in SESSION_QUOTAS:
+        raise HTTPException(status_code=400, detail=f"Unknown subscription type, expected one of {', '.join(SESSION_QUOTAS)}")
 
-    db_subscription = Subscription(**subscription.dict())
+    db_subscription = Subscription(**subscription.dict(), next_billing_date=next_billing_date(datetime.utcnow()))
     db.add(db_subscription)
     db.commit()
     db.refresh(db_subscription)
+    # The user's cached quota belongs to the previous subscription
+    reset_quotas([db_subscription.user_id])
     return db_subscription
 
 @router.get("/subscriptions/{user_id}", response_model=SubscriptionResponse)
 def get_subscription(user_id: int, db: Session = Depends(get_db)):
-    db_subscription = db.query(Subscription).filter(Subscription.user_id == user_id).first()
+    # The same subscription the user's session quota is based on
+    db_subscription = db.execute(current_subscription(user_id)).scalars().first()
     if not db_subscription:
         raise HTTPException(status_code=404, detail="Subscription not found")
-    return db_subscription
\ No newline at end of file
+    # Usage since the last reconcile is only counted in Redis
+    return SubscriptionResponse.from_orm(db_subscription).copy(update={
+        "sessions_used": live_sessions_used(db_subscription),
+        "sessions_limit": quota_limit(db_subscription),
+    })
\ No newline at end of file
@@ -1,9 +1,16 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import base64
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, joinedload, load_only
 from models.tool import Tool
 from models.user_tool import UserTool
 from database import get_db
+from services.http_cache_service import etag_response
+from services.tool_catalog_service import tool_catalog
+from services.tool_popularity_service import TOOL_POPULARITY_MAX_LIMIT, popular_tools, record_tool_interaction
+from services.tool_recommendation_service import mark_neighbors_dirty, recommend_tools, record_tool_cooccurrence
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -15,16 +22,18 @@ class ToolCreate(BaseModel):
     category: str
     content: str
 
-class ToolResponse(BaseModel):
+class ToolSummary(BaseModel):
     id: int
     name: str
     description: str
     category: str
-    content: str
 
     class Config:
         orm_mode = True
 
+class ToolResponse(ToolSummary):
+    content: str
+
 class UserToolCreate(BaseModel):
     user_id: int
     tool_id: int
@@ -33,32 +42,143 @@ class UserToolResponse(BaseModel):
     id: int
     user_id: int
     tool_id: int
-    interaction_date: datetime
+    interaction_date: Optional[datetime]
 
     class Config:
         orm_mode = True
 
+class UserToolHistoryEntry(UserToolResponse):
+    tool: Optional[ToolSummary]
+
+class PopularTool(BaseModel):
+    tool: ToolSummary
+    interaction_count: int
+
+class RecommendedTool(BaseModel):
+    tool: ToolSummary
+    score: float
+
 
 @router.post("/tools", response_model=ToolResponse)
 def create_tool(tool: ToolCreate, db: Session = Depends(get_db)):
     db_tool = Tool(**tool.dict())
     db.add(db_tool)
     db.commit()
+    tool_catalog.publish_change()
     db.refresh(db_tool)
     return db_tool
 
-@router.get("/tools", response_model=list[ToolResponse])
-def get_tools(db: Session = Depends(get_db)):
-    return db.query(Tool).all()
+@router.get("/tools", response_model=Union[list[ToolResponse], list[ToolSummary]])
+def get_tools(
+    request: Request,
+    category: Optional[str] = None,
+    include_content: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    List the tool catalog from this worker's snapshot, optionally for one category.
+
+    Each tool's content is only included when include_content is true, so the
+    response is a list of ToolResponse or of ToolSummary. The prebuilt body is
+    returned as is and not filtered through the response model.
+    """
+    snapshot = tool_catalog.get(db)
+    response = etag_response(request, snapshot.listing(category, include_content))
+    response.headers["X-Catalog-Version"] = str(snapshot.version)
+    return response
+
+@router.get("/popular", response_model=list[PopularTool])
+def get_popular_tools(limit: int = Query(10, ge=1, le=TOOL_POPULARITY_MAX_LIMIT), db: Session = Depends(get_db)):
+    """
+    List the most used tools, most used first.
+    """
+    tools = {tool["id"]: tool for tool in tool_catalog.get(db).tools}
+    return [
+        {"tool": tools[tool_id], "interaction_count": interaction_count}
+        for tool_id, interaction_count in popular_tools(db, limit)
+        if tool_id in tools
+    ]
 
 @router.post("/user_tools", response_model=UserToolResponse)
 def create_user_tool(user_tool: UserToolCreate, db: Session = Depends(get_db)):
-    db_user_tool = UserTool(**user_tool.dict())
+    db_user_tool = UserTool(**user_tool.dict(), interaction_date=datetime.utcnow())
     db.add(db_user_tool)
+    db.flush()
+    record_tool_interaction(db, db_user_tool)
+    changed_tools = record_tool_cooccurrence(db, db_user_tool)
     db.commit()
+    mark_neighbors_dirty(changed_tools)
     db.refresh(db_user_tool)
     return db_user_tool
 
-@router.get("/user_tools/{user_id}", response_model=list[UserToolResponse])
-def get_user_tools(user_id: int, db: Session = Depends(get_db)):
-    return db.query(UserTool).filter(UserTool.user_id == user_id).all()
\ No newline at end of file
+@router.get("/recommendations/{user_id}", response_model=list[RecommendedTool])
+def get_tool_recommendations(user_id: int, limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """
+    Recommend tools similar to the ones the user used most recently.
+    """
+    tools = {tool["id"]: tool for tool in tool_catalog.get(db).tools}
+    return [
+        {"tool": tools[tool_id], "score": score}
+        for tool_id, score in recommend_tools(db, user_id, limit)
+        if tool_id in tools
+    ]
+
+def encode_history_cursor(user_tool: UserTool):
+    """
+    Encode the (interaction_date, id) position of an interaction as an opaque cursor.
+    """
+    date = user_tool.interaction_date.isoformat() if user_tool.interaction_date else ""
+    return base64.urlsafe_b64encode(f"{date}|{user_tool.id}".encode()).decode()
+
+def decode_history_cursor(cursor: str):
+    """
+    Decode a cursor produced by encode_history_cursor.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    try:
+        date, user_tool_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return (datetime.fromisoformat(date) if date else None), int(user_tool_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/user_tools/{user_id}", response_model=list[UserToolHistoryEntry])
+def get_user_tools(
+    user_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Get a page of a user's tool interactions, newest first, each with its tool's summary.
+
+    When more interactions exist, the X-Next-Cursor response header holds the
+    cursor for the next page.
+    """
+    query = (
+        db.query(UserTool)
+        .options(joinedload(UserTool.tool).load_only(Tool.id, Tool.name, Tool.description, Tool.category))
+        .filter(UserTool.user_id == user_id)
+    )
+    if cursor:
+        date, user_tool_id = decode_history_cursor(cursor)
+        # Interactions recorded before dates were stored have none and come last
+        if date is None:
+            query = query.filter(UserTool.interaction_date.is_(None), UserTool.id < user_tool_id)
+        else:
+            query = query.filter(or_(
+                UserTool.interaction_date < date,
+                and_(UserTool.interaction_date == date, UserTool.id < user_tool_id),
+                UserTool.interaction_date.is_(None),
+            ))
+    user_tools = (
+        query.order_by(UserTool.interaction_date.desc().nulls_last(), UserTool.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    if len(user_tools) > limit:
+        user_tools = user_tools[:limit]
+        response.headers["X-Next-Cursor"] = encode_history_cursor(user_tools[-1])
+    return user_tools
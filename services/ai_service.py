@@ -1,16 +1,77 @@
 import os
-from cerebras.cloud.sdk import Cerebras
-from pydub import AudioSegment
-import speech_recognition as sr
-import base64
-import io
+from contextlib import asynccontextmanager
+from cerebras.cloud.sdk import AsyncCerebras
+import asyncio
+import httpx
+from services.speech_service import transcribe_audio
 
 # Initialize Cerebras client
 api_key = os.getenv('CEREBRAS_API_KEY')
 if not api_key:
     raise ValueError("CEREBRAS_API_KEY environment variable not set")
 
-client = Cerebras(api_key=api_key)
+MODEL_NAME = "llama3.1-8b"
+
+THERAPIST_SYSTEM_PROMPT = (
+    "You are a kind and empathetic virtual therapist. Engage users with reflective questions and avoid direct advice. "
+    "Build on their input step by step."
+)
+
+# Provider call limits
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "32"))
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "60"))
+AI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", str(AI_MAX_CONCURRENCY)))
+
+# One keep-alive connection pool shared by every completion in this process
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=AI_MAX_CONCURRENCY,
+        max_keepalive_connections=AI_MAX_KEEPALIVE_CONNECTIONS,
+    ),
+    timeout=AI_REQUEST_TIMEOUT,
+)
+
+client = AsyncCerebras(api_key=api_key, http_client=http_client, timeout=AI_REQUEST_TIMEOUT)
+
+_completion_slots = None
+
+@asynccontextmanager
+async def completion_slot():
+    """
+    Hold one of the AI_MAX_CONCURRENCY provider slots for the duration of a call.
+    """
+    global _completion_slots
+    if _completion_slots is None:
+        # Created lazily so the semaphore belongs to the running event loop
+        _completion_slots = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+    async with _completion_slots:
+        yield
+
+async def create_completion(messages: list):
+    """
+    Request a full (non-streamed) completion without blocking the event loop.
+
+    Args:
+        messages (list): Chat messages in provider format.
+
+    Returns:
+        str: The generated message content.
+
+    Raises:
+        asyncio.TimeoutError: If the provider does not answer within AI_REQUEST_TIMEOUT.
+    """
+    async with completion_slot():
+        chat_completion = await asyncio.wait_for(
+            client.chat.completions.create(model=MODEL_NAME, messages=messages),
+            timeout=AI_REQUEST_TIMEOUT,
+        )
+    return chat_completion.choices[0].message.content
+
+async def close_ai_client():
+    """
+    Close the shared provider connection pool.
+    """
+    await client.close()  # Also closes http_client
 
 # Preprocessing text
 def preprocess_text(text: str):
@@ -19,28 +80,8 @@ def preprocess_text(text: str):
 
 # Function to process audio (Base64-encoded) and convert it to text
 async def process_audio_to_text(base64_audio: str):
-    # Decode the Base64 audio data into binary
-    audio_data = base64.b64decode(base64_audio)
-
-    # Convert the binary audio data into a format suitable for speech recognition
-    audio_file = io.BytesIO(audio_data)  # Create an in-memory bytes buffer
-    recognizer = sr.Recognizer()
-
-    try:
-        # Read the audio file into SpeechRecognition's AudioFile object
-        with sr.AudioFile(audio_file) as source:
-            audio = recognizer.record(source)  # Read the entire audio file
-
-            # Recognize speech using Google Web Speech API
-            text = recognizer.recognize_google(audio)
-            return text
-
-    except sr.UnknownValueError:
-        # Handle if the speech was unintelligible
-        raise ValueError("Could not understand the audio")
-    except sr.RequestError:
-        # Handle if the request to the recognition service failed
-        raise ValueError("Could not request results from the speech recognition service")
+    # Decoding and recognition run in the speech worker pool, off the event loop
+    return await transcribe_audio(base64_audio)
 
 
 # Processing the response from AI (Llama3.1-8B)
@@ -59,25 +100,74 @@ async def get_answer(input_text: str):
     # Preprocess input to include clear conversational context
     preprocessed_text = preprocess_text(input_text)
     
-    chat_completion = client.chat.completions.create(
-        model="llama3.1-8b",
-        messages=[
-            {"role": "system", "content": "You are a kind and empathetic virtual therapist. Engage users with reflective questions and avoid direct advice. Build on their input step by step."},
-            {"role": "user", "content": preprocessed_text},
-        ],
-    )
-    
-    message_content = chat_completion.choices[0].message.content
+    message_content = await create_completion([
+        {"role": "system", "content": THERAPIST_SYSTEM_PROMPT},
+        {"role": "user", "content": preprocessed_text},
+    ])
     return {"response": message_content}
 
 async def get_advanced_answer(messages: list):
     # Preprocess input to include clear conversational context
     print(f"messages: {messages}")
     
-    chat_completion = client.chat.completions.create(
-        model="llama3.1-8b",
-        messages=messages,
-    )
-    
-    message_content = chat_completion.choices[0].message.content
+    message_content = await create_completion(messages)
     return {"response": message_content}
+
+async def stream_answer(input_text: str):
+    """
+    Stream the reply to a single user input chunk by chunk.
+
+    Args:
+        input_text (str): The user input, optionally prefixed with instructions.
+
+    Yields:
+        str: The next piece of generated text.
+    """
+    preprocessed_text = preprocess_text(input_text)
+    messages = [
+        {"role": "system", "content": THERAPIST_SYSTEM_PROMPT},
+        {"role": "user", "content": preprocessed_text},
+    ]
+    async for chunk in stream_advanced_answer(messages):
+        yield chunk
+
+async def stream_advanced_answer(messages: list):
+    """
+    Stream the reply to a full conversation chunk by chunk.
+
+    The provider is asked for a streamed completion and every non-empty
+    delta is yielded as soon as it arrives.
+
+    Args:
+        messages (list): Chat messages in provider format.
+
+    Yields:
+        str: The next piece of generated text.
+
+    Raises:
+        asyncio.TimeoutError: If the whole stream takes longer than AI_REQUEST_TIMEOUT.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + AI_REQUEST_TIMEOUT
+    # The slot is held until the stream is exhausted, so the whole stream shares one
+    # deadline; a trickling provider cannot hold it longer than AI_REQUEST_TIMEOUT
+    async with completion_slot():
+        stream = await asyncio.wait_for(
+            client.chat.completions.create(model=MODEL_NAME, messages=messages, stream=True),
+            timeout=AI_REQUEST_TIMEOUT,
+        )
+        chunks = stream.__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+        finally:
+            # Release the provider connection when the stream is abandoned or times out
+            await stream.close()
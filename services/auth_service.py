@@ -1,36 +1,72 @@
+import asyncio
 import redis
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from fastapi import HTTPException
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 from models.user import User
+from services.redis_service import async_redis_client, redis_client, subscribe
 
 load_dotenv()  # Load environment variables from .env file
 
-# Database URL and Redis setup
+# Database URL
 DATABASE_URL = os.getenv("DATABASE_URL")
-REDIS_URL = os.getenv("REDIS_URL")
 
-# Set up Redis connection
-redis_client = redis.StrictRedis.from_url(REDIS_URL)
+# Password hashing settings
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
 
-# Cryptographic context for password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cryptographic context for password hashing; hashes made with another cost are flagged for rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt runs here so a burst of logins cannot occupy the request threadpool
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "prodevkitty_jwt_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 
+# Validated-token cache settings
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+TOKEN_REVOCATION_CHANNEL = "auth:token_revocations"
+
+# token -> [payload, user_id, cached_until]; LRU order, shared with the revocation listener thread
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+# Bumped on every eviction, so a lookup that raced a revocation does not cache the token again
+_token_cache_generation = 0
+_revocation_listener = None
+
 def hash_password(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_hashing(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+
+def shutdown_hash_executor():
+    _hash_executor.shutdown(wait=False)
+
 # Create JWT token and store in Redis
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -57,46 +93,213 @@ def create_access_token(data: dict):
 
     return token
 
-def validate_access_token(token: str):
-    print("Token validation started!")
-    try:
-        # Decode the token and extract the payload
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"Decoded Payload: {payload}")
+def _get_cached_token(token: str):
+    with _token_cache_lock:
+        entry = _token_cache.get(token)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            del _token_cache[token]
+            return None
+        _token_cache.move_to_end(token)
+        return entry
+
+def _cache_token(token: str, payload: dict, user_id, generation: int, cached_until=None):
+    if cached_until is None:
+        # Never trust a cached token past its own expiry
+        cached_until = min(payload["exp"], time.time() + TOKEN_CACHE_TTL_SECONDS)
+    entry = [payload, user_id, cached_until]
+    with _token_cache_lock:
+        # Skip the insert if any token was evicted since the lookup started
+        if generation != _token_cache_generation:
+            return entry
+        _token_cache[token] = entry
+        _token_cache.move_to_end(token)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return entry
+
+def evict_cached_token(token):
+    """
+    Drop a token from this worker's validated-token cache.
+    """
+    global _token_cache_generation
+    if isinstance(token, bytes):
+        token = token.decode()
+    with _token_cache_lock:
+        _token_cache_generation += 1
+        _token_cache.pop(token, None)
 
-        # Check token status and TTL in Redis
-        token_status = redis_client.get(token)
-        token_ttl = redis_client.ttl(token)
-        print(f"Token status: {token_status}, TTL: {token_ttl}")
+def start_revocation_listener():
+    """
+    Evict revoked tokens from this worker's cache as soon as any worker revokes them.
+    """
+    global _revocation_listener
+    if _revocation_listener is None:
+        _revocation_listener = subscribe(TOKEN_REVOCATION_CHANNEL, evict_cached_token)
 
-        # Log the current time and expiration time for comparison
-        current_time = datetime.utcnow()
-        expiration_time = datetime.utcfromtimestamp(payload['exp'])
-        print(f"Current time: {current_time}, Token expiration time: {expiration_time}")
+def stop_revocation_listener():
+    global _revocation_listener
+    if _revocation_listener is not None:
+        _revocation_listener.stop()
+        _revocation_listener = None
 
-        if not token_status or token_ttl <= 0:
-            redis_client.delete(token)  # Remove token from Redis
-            raise JWTError("Token expired or invalid")
+def revoke_access_token(token: str):
+    """
+    Revoke a token in Redis and tell every worker to forget it.
+    """
+    pipe = redis_client.pipeline()
+    pipe.delete(token)
+    pipe.publish(TOKEN_REVOCATION_CHANNEL, token)
+    pipe.execute()
+    evict_cached_token(token)
 
-        return payload
+def _decode_token(token: str):
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Token expired or invalid")
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
-    print("test:")
-    if user and verify_password(password, user.password_hash):
-        return user
-    return None
+def _validate_token_entry(token: str):
+    generation = _token_cache_generation
+    entry = _get_cached_token(token)
+    if entry is not None:
+        return entry
+
+    payload = _decode_token(token)
+
+    # Check token status and TTL in Redis in a single round-trip
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.get(token)
+    pipe.ttl(token)
+    token_status, token_ttl = pipe.execute()
+
+    if not token_status or token_ttl <= 0:
+        redis_client.delete(token)  # Remove token from Redis
+        raise HTTPException(status_code=401, detail="Token expired or invalid")
+
+    return _cache_token(token, payload, payload.get("uid"), generation)
+
+async def _validate_token_entry_async(token: str, generation: int):
+    entry = _get_cached_token(token)
+    if entry is not None:
+        return entry
+
+    payload = _decode_token(token)
+
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.get(token)
+        pipe.ttl(token)
+        token_status, token_ttl = await pipe.execute()
+
+    if not token_status or token_ttl <= 0:
+        await async_redis_client.delete(token)
+        raise HTTPException(status_code=401, detail="Token expired or invalid")
+
+    return _cache_token(token, payload, payload.get("uid"), generation)
+
+def validate_access_token(token: str):
+    """
+    Validate an access token.
+
+    Tokens validated within the last TOKEN_CACHE_TTL_SECONDS are answered from an
+    in-process LRU cache without touching Redis; revocations reach the cache
+    through Redis pub/sub.
+
+    Args:
+        token (str): The JWT access token.
+
+    Returns:
+        dict: The token payload.
+
+    Raises:
+        HTTPException: If the token is invalid, expired or revoked.
+    """
+    return _validate_token_entry(token)[0]
+
+async def validate_access_token_async(token: str):
+    """
+    Async variant of validate_access_token for event-loop callers; a cache
+    miss is checked through the async Redis client.
+
+    Args:
+        token (str): The JWT access token.
+
+    Returns:
+        dict: The token payload.
+
+    Raises:
+        HTTPException: If the token is invalid, expired or revoked.
+    """
+    return (await _validate_token_entry_async(token, _token_cache_generation))[0]
+
+async def resolve_token_user(token: str, db: AsyncSession):
+    """
+    Validate an access token and resolve the id of its user.
+
+    The id comes from the token's uid claim or, for tokens issued without one,
+    from a single lookup whose result is cached together with the token until
+    the token's original cache expiry. A token revoked during the lookup is
+    not cached again.
+
+    Args:
+        token (str): The JWT access token.
+        db (AsyncSession): The async database session.
+
+    Returns:
+        tuple: The token payload and the user id (None if the user no longer exists).
+
+    Raises:
+        HTTPException: If the token is invalid, expired or revoked.
+    """
+    generation = _token_cache_generation
+    payload, user_id, cached_until = await _validate_token_entry_async(token, generation)
+    if user_id is not None:
+        return payload, user_id
+
+    user_id = (await db.execute(select(User.id).where(User.username == payload["sub"]))).scalar()
+    if user_id is not None:
+        _cache_token(token, payload, user_id, generation, cached_until)
+    return payload, user_id
+
+async def authenticate_user(db: Session, username: str, password: str):
+    """
+    Check a username and password.
+
+    The user lookup runs in the request threadpool and bcrypt in the dedicated
+    hashing executor. A hash made with a cost other than BCRYPT_ROUNDS is
+    replaced after a successful login.
+
+    Args:
+        db (Session): The database session.
+        username (str): The username.
+        password (str): The plain password.
+
+    Returns:
+        User: The authenticated user, or None if the credentials are wrong.
+    """
+    user = await run_in_threadpool(db.query(User).filter(User.username == username).first)
+    if not user:
+        return None
+    valid, new_hash = await _run_hashing(pwd_context.verify_and_update, password, user.password_hash)
+    if not valid:
+        return None
+    if new_hash:
+        user.password_hash = new_hash
+        await run_in_threadpool(db.commit)
+        await run_in_threadpool(db.refresh, user)
+    return user
+
+def user_exists(db: Session, username: str):
+    return db.query(User.id).filter(User.username == username).first() is not None
 
 # Register a new user
-def register_user(db, username: str, password: str, email: str):
-    existing_user = db.query(User).filter(User.username == username).first()
-    if existing_user:
+async def register_user(db, username: str, password: str, email: str):
+    if await run_in_threadpool(user_exists, db, username):
         raise HTTPException(status_code=400, detail="Username already taken")
-    hashed_password = hash_password(password)
+    hashed_password = await _run_hashing(hash_password, password)
     new_user = User(username= username, email= email, password_hash=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return {"msg": "User registered successfully", "user_id": new_user.id, "user_name": new_user.username}
\ No newline at end of file
+    await run_in_threadpool(db.commit)
+    await run_in_threadpool(db.refresh, new_user)
+    return {"msg": "User registered successfully", "user_id": new_user.id, "user_name": new_user.username}
@@ -0,0 +1,38 @@
+import os
+from services.redis_service import redis_client
+
+# Blog read cache settings
+BLOG_CACHE_TTL_SECONDS = int(os.getenv("BLOG_CACHE_TTL_SECONDS", "300"))
+BLOG_CACHE_VERSION_KEY = "blog:cache_version"
+
+def cached_body(name: str, loader):
+    """
+    Read-through cache for serialized blog responses.
+
+    Cache keys include a version number that every blog write bumps, so a
+    write invalidates all cached posts and pages at once. A reader that loaded
+    a post just before a write stores it under the old version, where no later
+    reader looks.
+
+    Args:
+        name (str): The cache entry name, e.g. "post:42".
+        loader (callable): Returns the JSON body as bytes, or None if there is nothing to cache.
+
+    Returns:
+        bytes: The JSON body, or None if the loader returned None.
+    """
+    version = int(redis_client.get(BLOG_CACHE_VERSION_KEY) or 0)
+    key = f"blog:{version}:{name}"
+    body = redis_client.get(key)
+    if body is None:
+        body = loader()
+        if body is None:
+            return None
+        redis_client.set(key, body, ex=BLOG_CACHE_TTL_SECONDS)
+    return body
+
+def invalidate_blog_cache():
+    """
+    Invalidate every cached blog response. Call after committing a blog write.
+    """
+    redis_client.incr(BLOG_CACHE_VERSION_KEY)
@@ -0,0 +1,80 @@
+import base64
+import os
+from sqlalchemy import Float, cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Session
+from models.blog_post import BLOG_SEARCH_COLUMNS, BLOG_SEARCH_CONFIG, BlogPost
+
+# Snippet settings, passed to ts_headline
+BLOG_SEARCH_HEADLINE_OPTIONS = os.getenv(
+    "BLOG_SEARCH_HEADLINE_OPTIONS",
+    "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2",
+)
+
+def encode_search_cursor(rank: float, post_id: int):
+    """
+    Encode the (rank, id) position of a search result as an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(f"{rank!r}|{post_id}".encode()).decode()
+
+def decode_search_cursor(cursor: str):
+    """
+    Decode a cursor produced by encode_search_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    rank, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return float(rank), int(post_id)
+
+def search_posts(db: Session, q: str, limit: int, cursor: str = None):
+    """
+    Full-text search over blog posts, best match first.
+
+    Matching uses the GIN-indexed search_vector column. Results are ordered by
+    ts_rank_cd and then ID, and pages continue from a (rank, id) cursor.
+    Highlighted snippets are only built for the rows of the returned page.
+
+    Args:
+        db (Session): The database session.
+        q (str): The search query, in web search syntax ("quoted phrases", or, -excluded).
+        limit (int): The page size.
+        cursor (str): The cursor returned with the previous page, if any.
+
+    Returns:
+        tuple: The result rows (id, title, author, date, views, mainImage, rank,
+            snippet) and the cursor of the next page, or None on the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    config = cast(BLOG_SEARCH_CONFIG, REGCONFIG)
+    query = func.websearch_to_tsquery(config, q)
+    rank = cast(func.ts_rank_cd(BlogPost.search_vector, query), Float).label("rank")
+    matches = select(BlogPost.id, rank).where(BlogPost.search_vector.op("@@")(query))
+    if cursor:
+        matches = matches.where(tuple_(rank, BlogPost.id) < decode_search_cursor(cursor))
+    page = matches.order_by(rank.desc(), BlogPost.id.desc()).limit(limit + 1).subquery()
+
+    # Every indexed column, so a post matched by any of them gets a highlighted snippet
+    document = func.concat_ws(" ", *[getattr(BlogPost, name) for name in BLOG_SEARCH_COLUMNS])
+    snippet = func.ts_headline(
+        config,
+        document,
+        query,
+        BLOG_SEARCH_HEADLINE_OPTIONS,
+    ).label("snippet")
+    rows = db.execute(
+        select(
+            BlogPost.id, BlogPost.title, BlogPost.author, BlogPost.date,
+            BlogPost.views, BlogPost.mainImage, page.c.rank, snippet,
+        )
+        .join(page, page.c.id == BlogPost.id)
+        .order_by(page.c.rank.desc(), BlogPost.id.desc())
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(rows[-1].rank, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, column, delete, func, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import AsyncSessionLocal
+from models.blog_post import BlogPost
+from models.blog_view_flush import BlogViewFlush
+from services.redis_service import async_redis_client, redis_client
+
+# View counter settings
+BLOG_VIEW_FLUSH_INTERVAL = float(os.getenv("BLOG_VIEW_FLUSH_INTERVAL", "10"))
+BLOG_VIEWS_PENDING_KEY = "blog:views:pending"
+BLOG_VIEWS_FLUSHING_KEY = "blog:views:flushing"
+BLOG_VIEWS_FLUSH_LOCK_KEY = "blog:views:flush_lock"
+# Views already written to the database, per post, kept in step by the flusher
+BLOG_VIEWS_PERSISTED_KEY = "blog:views:persisted"
+# Field of the flushing hash holding its batch id, recorded in blog_view_flushes once written
+BLOG_VIEWS_BATCH_FIELD = "batch_id"
+BLOG_VIEW_FLUSH_RETENTION = timedelta(days=1)
+
+# Drop the flushing hash only if it still holds the given batch, and mirror the new totals
+_FINISH_FLUSH_SCRIPT = async_redis_client.register_script("""
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    redis.call('DEL', KEYS[1])
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+return 1
+""")
+
+# Release the flush lock only if this flush still holds it
+_RELEASE_LOCK_SCRIPT = async_redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+def record_view(post_id: int):
+    """
+    Count a view of a blog post.
+
+    Views are counted in a Redis hash and written to the database in batches
+    by the view flusher, so popular posts never contend on their row.
+
+    Args:
+        post_id (int): The blog post ID.
+
+    Returns:
+        int: The number of the post's views not yet written to the database.
+    """
+    return redis_client.hincrby(BLOG_VIEWS_PENDING_KEY, post_id, 1)
+
+def pending_views(post_ids: list):
+    """
+    Get the views of blog posts that have not been written to the database yet.
+
+    Args:
+        post_ids (list): The blog post IDs.
+
+    Returns:
+        dict: Post ID to pending view count.
+    """
+    if not post_ids:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hmget(BLOG_VIEWS_PENDING_KEY, post_ids)
+    pipe.hmget(BLOG_VIEWS_FLUSHING_KEY, post_ids)
+    queued, flushing = pipe.execute()
+    return {
+        post_id: int(queued_count or 0) + int(flushing_count or 0)
+        for post_id, queued_count, flushing_count in zip(post_ids, queued, flushing)
+    }
+
+def current_views(db: Session, post_ids: list):
+    """
+    Get the total views of blog posts: the views in the database plus the pending ones.
+
+    Cached blog responses leave views out and readers fill them in from here,
+    so counting views never invalidates the blog cache. Database counts are
+    mirrored in a Redis hash that the flusher updates with each write; posts
+    missing from it are loaded from the database once.
+
+    Args:
+        db (Session): The database session, only used for posts not mirrored yet.
+        post_ids (list): The blog post IDs.
+
+    Returns:
+        dict: Post ID to view count.
+    """
+    if not post_ids:
+        return {}
+    persisted = redis_client.hmget(BLOG_VIEWS_PERSISTED_KEY, post_ids)
+    missing = [post_id for post_id, views in zip(post_ids, persisted) if views is None]
+    if missing:
+        pipe = redis_client.pipeline(transaction=False)
+        for post_id, views in db.query(BlogPost.id, BlogPost.views).filter(BlogPost.id.in_(missing)):
+            # A count the flusher wrote meanwhile is newer than the one read here
+            pipe.hsetnx(BLOG_VIEWS_PERSISTED_KEY, post_id, views or 0)
+        pipe.execute()
+    # One transaction, so a flush moving views from pending to persisted is seen whole
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hmget(BLOG_VIEWS_PERSISTED_KEY, post_ids)
+    pipe.hmget(BLOG_VIEWS_PENDING_KEY, post_ids)
+    pipe.hmget(BLOG_VIEWS_FLUSHING_KEY, post_ids)
+    persisted, queued, flushing = pipe.execute()
+    return {
+        post_id: int(persisted_count or 0) + int(queued_count or 0) + int(flushing_count or 0)
+        for post_id, persisted_count, queued_count, flushing_count in zip(post_ids, persisted, queued, flushing)
+    }
+
+def forget_views(post_id: int):
+    """
+    Drop a post's mirrored view count after its row was changed or deleted. Call after committing.
+    """
+    redis_client.hdel(BLOG_VIEWS_PERSISTED_KEY, post_id)
+
+async def flush_views():
+    """
+    Write the pending views of all posts to the database in one UPDATE.
+
+    The pending hash is renamed aside before it is written so views counted
+    meanwhile start a new hash; readers add both hashes until the write is
+    done. The new totals replace the mirrored counts in the same Redis
+    transaction that drops the written batch, and no cache is invalidated.
+
+    A Redis lock lets one worker flush at a time, and a batch left aside by a
+    failed or interrupted flush is retried before a new one is taken. Each
+    batch carries an id that is recorded in the UPDATE's transaction, so a
+    batch retried after it was written, or flushed again by a worker that
+    took over an expired lock, is not counted twice.
+
+    Returns:
+        int: The number of posts updated.
+    """
+    lock_token = uuid.uuid4().hex
+    if not await async_redis_client.set(BLOG_VIEWS_FLUSH_LOCK_KEY, lock_token, nx=True, ex=max(30, int(BLOG_VIEW_FLUSH_INTERVAL * 3))):
+        return 0
+    try:
+        if not await async_redis_client.exists(BLOG_VIEWS_FLUSHING_KEY):
+            if not await async_redis_client.exists(BLOG_VIEWS_PENDING_KEY):
+                return 0
+            await async_redis_client.rename(BLOG_VIEWS_PENDING_KEY, BLOG_VIEWS_FLUSHING_KEY)
+        # A batch that already has an id keeps it
+        await async_redis_client.hsetnx(BLOG_VIEWS_FLUSHING_KEY, BLOG_VIEWS_BATCH_FIELD, uuid.uuid4().hex)
+        deltas = await async_redis_client.hgetall(BLOG_VIEWS_FLUSHING_KEY)
+        batch_id = deltas.pop(BLOG_VIEWS_BATCH_FIELD, None)
+        if batch_id is None:
+            # Dropped by a flush that took over an expired lock
+            return 0
+        totals = []
+        if deltas:
+            post_ids = [int(post_id) for post_id in deltas]
+            async with AsyncSessionLocal() as db:
+                # Waits for a concurrent flush of the same batch, then finds it written
+                recorded = (await db.execute(
+                    insert(BlogViewFlush)
+                    .values(batch_id=batch_id, flushed_at=datetime.utcnow())
+                    .on_conflict_do_nothing(index_elements=[BlogViewFlush.batch_id])
+                    .returning(BlogViewFlush.batch_id)
+                )).first()
+                if recorded is None:
+                    totals = (await db.execute(
+                        select(BlogPost.id, BlogPost.views).where(BlogPost.id.in_(post_ids))
+                    )).all()
+                else:
+                    pending = values(column("id", Integer), column("delta", Integer), name="pending").data(
+                        [(int(post_id), int(delta)) for post_id, delta in deltas.items()]
+                    )
+                    totals = (await db.execute(
+                        update(BlogPost)
+                        .where(BlogPost.id == pending.c.id)
+                        .values(views=func.coalesce(BlogPost.views, 0) + pending.c.delta)
+                        .returning(BlogPost.id, BlogPost.views)
+                    )).all()
+                    await db.execute(
+                        delete(BlogViewFlush).where(BlogViewFlush.flushed_at < datetime.utcnow() - BLOG_VIEW_FLUSH_RETENTION)
+                    )
+                await db.commit()
+        await _FINISH_FLUSH_SCRIPT(
+            keys=[BLOG_VIEWS_FLUSHING_KEY, BLOG_VIEWS_PERSISTED_KEY],
+            args=[BLOG_VIEWS_BATCH_FIELD, batch_id, *[part for row in totals for part in (row[0], row[1] or 0)]],
+        )
+    finally:
+        await _RELEASE_LOCK_SCRIPT(keys=[BLOG_VIEWS_FLUSH_LOCK_KEY], args=[lock_token])
+    return len(deltas)
+
+async def _run_view_flusher():
+    while True:
+        await asyncio.sleep(BLOG_VIEW_FLUSH_INTERVAL)
+        try:
+            await flush_views()
+        except Exception as e:
+            print(f"Blog view flush failed: {e}")
+
+_flusher_task = None
+
+def start_view_flusher():
+    """
+    Start the background task writing pending blog views every BLOG_VIEW_FLUSH_INTERVAL seconds.
+    """
+    global _flusher_task
+    _flusher_task = asyncio.create_task(_run_view_flusher())
+
+async def stop_view_flusher():
+    """
+    Stop the view flusher and write the views still pending.
+    """
+    global _flusher_task
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+    try:
+        await flush_views()
+    except Exception as e:
+        print(f"Blog view flush failed: {e}")
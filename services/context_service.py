@@ -0,0 +1,182 @@
+import asyncio
+import os
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.conv_session import ConvSession
+from models.conversation_history import ConversationHistory
+from services.ai_service import create_completion
+from services.history_writer import history_writer
+
+# Context window settings
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_RECENT_MESSAGES = int(os.getenv("CONTEXT_RECENT_MESSAGES", "12"))
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "40"))
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", "200"))
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the running notes of a therapy conversation. Merge the current summary with the new messages "
+    "into one updated summary. Keep the user's feelings, concerns, important facts and any suggestions already "
+    f"given. Write in the third person and use at most {SUMMARY_MAX_WORDS} words."
+)
+
+# Sessions with a summary refresh in flight, and references that keep those tasks alive
+_summaries_in_progress = set()
+_background_tasks = set()
+
+def estimate_tokens(text: str):
+    """
+    Estimate the token count of a message.
+
+    Uses the usual ~4 characters per token approximation plus a small per-message overhead,
+    which is close enough for budgeting without loading a tokenizer.
+
+    Args:
+        text (str): The message content.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return len(text or "") // 4 + 4
+
+async def load_recent_messages(db: AsyncSession, session_id, limit: int):
+    """
+    Load the newest messages of a session in chronological order.
+
+    Messages still waiting in the history writer are included; they have no id yet.
+
+    Args:
+        db (AsyncSession): The async database session.
+        session_id: The conversation session UUID.
+        limit (int): The maximum number of messages to load.
+
+    Returns:
+        list: Message rows, oldest first.
+    """
+    pending = history_writer.pending_messages(session_id)
+    rows = (await db.execute(
+        select(ConversationHistory)
+        .where(ConversationHistory.session_id == session_id)
+        .order_by(ConversationHistory.id.desc())
+        .limit(limit)
+    )).scalars().all()
+    return history_writer.merge(rows[::-1], pending)[-limit:]
+
+async def build_context(db: AsyncSession, session_id, instructions: str):
+    """
+    Build the model input for a session within the token budget.
+
+    The prompt is made of the system instructions, the stored rolling summary of
+    older turns and as many of the last CONTEXT_RECENT_MESSAGES messages as fit in
+    CONTEXT_TOKEN_BUDGET. When older messages have left the window, a background
+    task folds them into the summary.
+
+    Args:
+        db (AsyncSession): The async database session.
+        session_id: The conversation session UUID.
+        instructions (str): The system instructions.
+
+    Returns:
+        list: Chat messages in provider format.
+    """
+    conv_session = (await db.execute(
+        select(ConvSession.summary, ConvSession.summarized_until_id).where(ConvSession.session_id == session_id)
+    )).first()
+    summary = conv_session.summary if conv_session else None
+    summarized_until_id = (conv_session.summarized_until_id if conv_session else None) or 0
+
+    system_prompt = instructions
+    if summary:
+        system_prompt = f"{instructions}\n\nSummary of the earlier conversation:\n{summary}"
+
+    # One extra message is loaded to tell whether anything older than the window exists
+    recent = await load_recent_messages(db, session_id, CONTEXT_RECENT_MESSAGES + 1)
+    candidates = recent[-CONTEXT_RECENT_MESSAGES:]
+
+    remaining = CONTEXT_TOKEN_BUDGET - estimate_tokens(system_prompt)
+    window = []
+    for msg in reversed(candidates):
+        cost = estimate_tokens(msg.message)
+        # Always keep the newest message, even if it alone exceeds the budget
+        if window and cost > remaining:
+            break
+        window.append(msg)
+        remaining -= cost
+    window.reverse()
+
+    evicted = recent[:len(recent) - len(window)]
+    if evicted and (evicted[-1].id is None or evicted[-1].id > summarized_until_id):
+        schedule_summary_refresh(session_id, window[0].id)
+
+    return [{"role": "system", "content": system_prompt}] + [
+        {"role": msg.role, "content": msg.message} for msg in window
+    ]
+
+def schedule_summary_refresh(session_id, window_start_id):
+    """
+    Start a background summary refresh unless one is already running for the session.
+
+    Args:
+        session_id: The conversation session UUID.
+        window_start_id (int): The id of the oldest message still sent verbatim,
+            or None if it has not been flushed yet.
+    """
+    key = str(session_id)
+    if key in _summaries_in_progress:
+        return
+    _summaries_in_progress.add(key)
+    task = asyncio.create_task(refresh_summary(session_id, window_start_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def refresh_summary(session_id, window_start_id):
+    """
+    Fold messages that left the context window into the session's rolling summary.
+
+    Only messages after the last summarized one are read, at most SUMMARY_BATCH_SIZE
+    at a time, so the cost of a refresh does not grow with the session length.
+
+    Args:
+        session_id: The conversation session UUID.
+        window_start_id (int): The id of the oldest message still sent verbatim,
+            or None if it has not been flushed yet, in which case every flushed
+            message is older than the window.
+    """
+    try:
+        # The session is closed before the (slow) model call so it does not hold a connection
+        async with AsyncSessionLocal() as db:
+            conv_session = (await db.execute(
+                select(ConvSession.summary, ConvSession.summarized_until_id).where(ConvSession.session_id == session_id)
+            )).first()
+            if not conv_session:
+                return
+            previous_summary = conv_session.summary
+            query = select(ConversationHistory.id, ConversationHistory.role, ConversationHistory.message).where(
+                ConversationHistory.session_id == session_id,
+                ConversationHistory.id > (conv_session.summarized_until_id or 0),
+            )
+            if window_start_id is not None:
+                query = query.where(ConversationHistory.id < window_start_id)
+            evicted = (await db.execute(
+                query.order_by(ConversationHistory.id).limit(SUMMARY_BATCH_SIZE)
+            )).all()
+        if not evicted:
+            return
+
+        transcript = "\n".join(f"{msg.role}: {msg.message}" for msg in evicted)
+        summary = await create_completion([
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+        ])
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(ConvSession)
+                .where(ConvSession.session_id == session_id)
+                .values(summary=summary, summarized_until_id=evicted[-1].id)
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"Error refreshing summary for session {session_id}: {e}")
+    finally:
+        _summaries_in_progress.discard(str(session_id))
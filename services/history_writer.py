@@ -0,0 +1,226 @@
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from database import AsyncSessionLocal
+from models.conversation_history import ConversationHistory
+
+# Write-behind settings
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.05"))
+HISTORY_FLUSH_SIZE = int(os.getenv("HISTORY_FLUSH_SIZE", "500"))
+HISTORY_SHUTDOWN_RETRIES = int(os.getenv("HISTORY_SHUTDOWN_RETRIES", "3"))
+
+# Failures after which a flush keeps its rows queued for the next attempt
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError, OSError)
+# Failures caused by the rows themselves, which are retried in smaller batches
+REJECTED_ERRORS = (IntegrityError, DataError)
+
+def is_rejected(error: Exception):
+    """
+    Whether a failed insert was refused because of its rows rather than the connection.
+    """
+    if isinstance(error, TRANSIENT_ERRORS) or getattr(error, "connection_invalidated", False):
+        return False
+    return isinstance(error, REJECTED_ERRORS)
+
+class HistoryWriter:
+    """
+    Write-behind persister for conversation_history rows.
+
+    Messages from every session are queued in memory and written with one
+    multi-row INSERT every HISTORY_FLUSH_INTERVAL seconds, or sooner once
+    HISTORY_FLUSH_SIZE rows are waiting. Until a row is flushed it stays in its
+    session's in-memory tail so readers can still see it.
+    """
+
+    def __init__(self, flush_interval: float, flush_size: int):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending = []
+        self._tails = defaultdict(list)
+        self._wakeup = None
+        self._flush_lock = None
+        self._task = None
+
+    def enqueue(self, session_id, role: str, message: str):
+        """
+        Queue a message for insertion.
+
+        Args:
+            session_id: The conversation session UUID.
+            role (str): 'user' or 'assistant'.
+            message (str): The message text.
+
+        Raises:
+            ValueError: If the row cannot be stored, so it never reaches a batch.
+        """
+        if session_id is None:
+            raise ValueError("History messages need a session")
+        if role not in ("user", "assistant"):
+            raise ValueError(f"Unknown history role: {role!r}")
+        if not isinstance(message, str) or not message:
+            raise ValueError("History messages must be non-empty strings")
+        row = {
+            "session_id": session_id,
+            "role": role,
+            "message": message,
+            "created_at": datetime.utcnow(),
+        }
+        self._pending.append(row)
+        self._tails[str(session_id)].append(row)
+        if len(self._pending) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending_messages(self, session_id):
+        """
+        Return the session's messages that have not been flushed yet, oldest first.
+
+        Args:
+            session_id: The conversation session UUID.
+
+        Returns:
+            list: Message objects with id set to None.
+        """
+        return [
+            SimpleNamespace(id=None, role=row["role"], message=row["message"], created_at=row["created_at"])
+            for row in self._tails.get(str(session_id), ())
+        ]
+
+    @staticmethod
+    def merge(rows, pending):
+        """
+        Append unflushed messages to rows read from the database.
+
+        Take the pending snapshot before running the database query: a message
+        flushed in between then shows up in both lists and is only kept once,
+        while no message can be missing from both.
+
+        Args:
+            rows (list): ConversationHistory rows, oldest first.
+            pending (list): The result of pending_messages, oldest first.
+
+        Returns:
+            list: The combined messages, oldest first.
+        """
+        if not pending:
+            return list(rows)
+        persisted = {(row.created_at, row.role, row.message) for row in rows}
+        return list(rows) + [
+            msg for msg in pending if (msg.created_at, msg.role, msg.message) not in persisted
+        ]
+
+    async def start(self):
+        """
+        Start the background flush loop.
+        """
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the flush loop and write everything that is still queued.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _ in range(HISTORY_SHUTDOWN_RETRIES):
+            await self.flush()
+            if not self._pending:
+                return
+        print(f"History writer stopped with {len(self._pending)} unsaved messages")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """
+        Write all queued rows in one transaction.
+
+        If the batch is rejected because of its rows (IntegrityError or
+        DataError), each session's rows are written on their own, and a session
+        that still fails row by row, so one bad row only loses itself. Any other
+        failure keeps the rows queued for the next flush.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                if not is_rejected(e):
+                    # Database unavailable: keep the rows and retry on the next flush
+                    print(f"History flush failed, retrying {len(batch)} messages: {e}")
+                    self._pending = batch + self._pending
+                    return
+                print(f"History flush failed, writing {len(batch)} messages by session: {e}")
+                retry = await self._insert_by_session(batch)
+                self._pending = retry + self._pending
+                retry_ids = {id(row) for row in retry}
+                batch = [row for row in batch if id(row) not in retry_ids]
+            self._release(batch)
+
+    async def _insert_by_session(self, batch):
+        """
+        Write a rejected batch one session at a time, falling back to single rows.
+
+        Returns:
+            list: Rows to retry because the database failed for a reason other
+                than the rows themselves. The rest of the batch is not attempted
+                then; for each session the retried rows are its last ones, so the
+                rows written before stay a prefix.
+        """
+        sessions = defaultdict(list)
+        for row in batch:
+            sessions[str(row["session_id"])].append(row)
+        sessions = list(sessions.values())
+        for index, rows in enumerate(sessions):
+            try:
+                await self._insert(rows)
+                continue
+            except Exception as e:
+                if not is_rejected(e):
+                    return [row for later in sessions[index:] for row in later]
+            for position, row in enumerate(rows):
+                try:
+                    await self._insert([row])
+                except Exception as e:
+                    if not is_rejected(e):
+                        return rows[position:] + [row for later in sessions[index + 1:] for row in later]
+                    print(f"Dropping history message of session {row['session_id']}: {e}")
+        return []
+
+    def _release(self, batch):
+        flushed = defaultdict(int)
+        for row in batch:
+            flushed[str(row["session_id"])] += 1
+        for key, count in flushed.items():
+            # Rows of a session are flushed in the order they were queued
+            del self._tails[key][:count]
+            if not self._tails[key]:
+                del self._tails[key]
+
+    @staticmethod
+    async def _insert(batch):
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(ConversationHistory), batch)
+            await db.commit()
+
+history_writer = HistoryWriter(HISTORY_FLUSH_INTERVAL, HISTORY_FLUSH_SIZE)
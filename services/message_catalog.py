@@ -0,0 +1,94 @@
+import json
+import os
+from bisect import bisect_right
+from functools import lru_cache
+
+# Directory holding one <language>.json catalog per supported language
+NOTIFICATION_CATALOG_DIR = os.getenv(
+    "NOTIFICATION_CATALOG_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "notifications"),
+)
+DEFAULT_LANGUAGE = os.getenv("NOTIFICATION_DEFAULT_LANGUAGE", "en")
+
+class MessageCatalog:
+    """
+    Motivational messages of one language, indexed by improvement threshold.
+
+    Thresholds are kept in an ascending array next to their pre-rendered
+    messages, so a lookup is a single bisect.
+    """
+
+    def __init__(self, thresholds: dict, default: str):
+        ordered = sorted((int(threshold), message) for threshold, message in thresholds.items())
+        self.thresholds = [threshold for threshold, _ in ordered]
+        self.messages = [message for _, message in ordered]
+        self.default = default
+
+    def lookup(self, improvement_percentage: int):
+        """
+        Get the message of the highest threshold not above the improvement percentage.
+
+        Args:
+            improvement_percentage (int): The percentage of improvement.
+
+        Returns:
+            str: The matching message, or the default one below the lowest threshold.
+        """
+        index = bisect_right(self.thresholds, improvement_percentage)
+        return self.messages[index - 1] if index else self.default
+
+def load_catalogs(directory: str):
+    """
+    Load every language catalog from a directory.
+
+    Args:
+        directory (str): Directory with <language>.json files.
+
+    Returns:
+        dict: MessageCatalog per lower-case language tag.
+    """
+    catalogs = {}
+    for filename in sorted(os.listdir(directory)):
+        language, extension = os.path.splitext(filename)
+        if extension != ".json":
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            data = json.load(f)
+        catalogs[language.lower()] = MessageCatalog(data["thresholds"], data["default"])
+    return catalogs
+
+catalogs = load_catalogs(NOTIFICATION_CATALOG_DIR)
+
+@lru_cache(maxsize=256)
+def resolve_language(language: str):
+    """
+    Resolve a requested locale to a loaded catalog language.
+
+    The fallback chain drops subtags one at a time ('es-MX' -> 'es') and ends
+    with DEFAULT_LANGUAGE.
+
+    Args:
+        language (str): The requested locale, e.g. 'es', 'es-MX' or 'pt_BR'.
+
+    Returns:
+        str: The language of the catalog to use.
+    """
+    tag = (language or "").replace("_", "-").lower()
+    while tag:
+        if tag in catalogs:
+            return tag
+        tag = tag.rpartition("-")[0]
+    return DEFAULT_LANGUAGE
+
+def get_motivational_message(improvement_percentage: int, language: str = DEFAULT_LANGUAGE):
+    """
+    Get the motivational message for an improvement percentage.
+
+    Args:
+        improvement_percentage (int): The percentage of improvement.
+        language (str): The requested locale.
+
+    Returns:
+        str: The motivational message.
+    """
+    return catalogs[resolve_language(language)].lookup(improvement_percentage)
@@ -0,0 +1,100 @@
+import os
+from datetime import datetime
+from pydantic import BaseModel, ValidationError, constr
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from models.progress import Progress
+from models.user import User
+from services.progress_stats_service import record_progress_batch
+
+# Largest accepted bulk request
+PROGRESS_BULK_MAX_ENTRIES = int(os.getenv("PROGRESS_BULK_MAX_ENTRIES", "5000"))
+
+class BulkProgressEntry(BaseModel):
+    idempotency_key: constr(min_length=1, max_length=128)
+    user_id: int
+    date: datetime
+    stress_level: int
+    negative_thoughts_reduction: int
+    positive_thoughts_increase: int
+
+def ingest_progress_bulk(db: Session, items: list):
+    """
+    Validate, deduplicate and insert a batch of progress entries in one transaction.
+
+    Each entry carries a client-generated idempotency key that is unique per
+    user. An entry whose key was already stored, by an earlier sync or earlier
+    in the same batch, is reported as a duplicate with the ID of the stored
+    entry instead of being inserted again, so a client can replay a batch
+    safely after a lost response.
+
+    Args:
+        db (Session): The database session.
+        items (list): The raw entries, validated here one by one.
+
+    Returns:
+        list: One result per item, in order, with its status ('created',
+            'duplicate' or 'invalid') and the entry ID or the validation errors.
+    """
+    results = [None] * len(items)
+    entries = {}
+    for index, item in enumerate(items):
+        try:
+            entry = BulkProgressEntry.parse_obj(item)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": "invalid", "errors": e.errors()}
+            continue
+        key = (entry.user_id, entry.idempotency_key)
+        if key in entries:
+            results[index] = {"index": index, "status": "duplicate", "key": key}
+            continue
+        entries[key] = (index, entry)
+
+    # One lookup for all referenced users instead of a foreign key failure aborting the batch
+    user_ids = {user_id for user_id, _ in entries}
+    known_users = set(db.execute(select(User.id).where(User.id.in_(user_ids))).scalars()) if user_ids else set()
+    for key, (index, entry) in list(entries.items()):
+        if key[0] not in known_users:
+            results[index] = {"index": index, "status": "invalid", "errors": [{"loc": ["user_id"], "msg": "User not found"}]}
+            del entries[key]
+
+    ids = {}
+    if entries:
+        inserted = db.execute(
+            insert(Progress)
+            .values([entry.dict() for _, entry in entries.values()])
+            .on_conflict_do_nothing(index_elements=[Progress.user_id, Progress.idempotency_key])
+            .returning(Progress.id, Progress.user_id, Progress.idempotency_key)
+        ).all()
+        created = {(user_id, key): progress_id for progress_id, user_id, key in inserted}
+        record_progress_batch(db, [entries[key][1] for key in created])
+
+        existing = set(entries) - set(created)
+        if existing:
+            ids.update(
+                ((user_id, key), progress_id)
+                for progress_id, user_id, key in db.execute(
+                    select(Progress.id, Progress.user_id, Progress.idempotency_key)
+                    .where(tuple_(Progress.user_id, Progress.idempotency_key).in_(list(existing)))
+                ).all()
+            )
+        db.commit()
+
+        for key, (index, _) in entries.items():
+            if key in created:
+                results[index] = {"index": index, "status": "created", "id": created[key]}
+            else:
+                results[index] = {"index": index, "status": "duplicate", "id": ids.get(key)}
+        ids.update(created)
+
+    # Duplicates within the batch share the outcome of the first entry with their key
+    for result in results:
+        if "key" not in result:
+            continue
+        key = result.pop("key")
+        if key in ids:
+            result["id"] = ids[key]
+        else:
+            result.update(status="invalid", errors=[{"loc": ["user_id"], "msg": "User not found"}])
+    return results
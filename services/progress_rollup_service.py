@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models.progress_rollup import ProgressRollup
+
+PERIODS = ("week", "month")
+ROLLUP_METRICS = ("stress_level", "negative_thoughts_reduction", "positive_thoughts_increase")
+
+def period_start(date: datetime, period: str):
+    """
+    Get the start of the week (Monday) or month containing a date, as PostgreSQL's date_trunc does.
+
+    Args:
+        date (datetime): The date.
+        period (str): 'week' or 'month'.
+
+    Returns:
+        datetime: Midnight on the first day of the period.
+    """
+    day = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def rollup_rows(entries):
+    """
+    Aggregate progress entries into one row per user, period and period start.
+
+    Args:
+        entries (list): Progress entries (anything with user_id, date and the metric attributes).
+
+    Returns:
+        list: Rollup row dicts, skipping entries without a date.
+    """
+    rows = {}
+    for entry in entries:
+        if entry.date is None:
+            continue
+        for period in PERIODS:
+            key = (entry.user_id, period, period_start(entry.date, period))
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {"user_id": key[0], "period": period, "period_start": key[2], "entry_count": 0}
+                for metric in ROLLUP_METRICS:
+                    row[f"{metric}_count"] = 0
+                    row[f"{metric}_sum"] = None
+                    row[f"{metric}_min"] = None
+                    row[f"{metric}_max"] = None
+            row["entry_count"] += 1
+            for metric in ROLLUP_METRICS:
+                value = getattr(entry, metric)
+                if value is None:
+                    continue
+                row[f"{metric}_count"] += 1
+                row[f"{metric}_sum"] = (row[f"{metric}_sum"] or 0) + value
+                row[f"{metric}_min"] = value if row[f"{metric}_min"] is None else min(row[f"{metric}_min"], value)
+                row[f"{metric}_max"] = value if row[f"{metric}_max"] is None else max(row[f"{metric}_max"], value)
+    return list(rows.values())
+
+def rollup_upsert(entries):
+    """
+    Build the statement folding newly inserted progress entries into their weekly and monthly rollups.
+
+    Args:
+        entries (list): The inserted progress entries.
+
+    Returns:
+        The upsert statement, or None if no entry has a date.
+    """
+    rows = rollup_rows(entries)
+    if not rows:
+        return None
+
+    stmt = insert(ProgressRollup).values(rows)
+    rollup = ProgressRollup.__table__.c
+    new = stmt.excluded
+    set_ = {"entry_count": rollup.entry_count + new.entry_count}
+    for metric in ROLLUP_METRICS:
+        set_[f"{metric}_count"] = rollup[f"{metric}_count"] + new[f"{metric}_count"]
+        set_[f"{metric}_sum"] = func.coalesce(rollup[f"{metric}_sum"], 0) + func.coalesce(new[f"{metric}_sum"], 0)
+        # LEAST and GREATEST ignore NULLs
+        set_[f"{metric}_min"] = func.least(rollup[f"{metric}_min"], new[f"{metric}_min"])
+        set_[f"{metric}_max"] = func.greatest(rollup[f"{metric}_max"], new[f"{metric}_max"])
+    return stmt.on_conflict_do_update(
+        index_elements=[rollup.user_id, rollup.period, rollup.period_start],
+        set_=set_,
+    )
+
+def record_rollups(db: Session, entries):
+    """
+    Fold newly inserted progress entries into their rollups. The caller commits.
+
+    Args:
+        db (Session): The database session.
+        entries (list): The inserted progress entries.
+    """
+    stmt = rollup_upsert(entries)
+    if stmt is not None:
+        db.execute(stmt)
+
+async def record_rollups_async(db: AsyncSession, entries):
+    """
+    Async variant of record_rollups. The caller commits.
+
+    Args:
+        db (AsyncSession): The async database session.
+        entries (list): The inserted progress entries.
+    """
+    stmt = rollup_upsert(entries)
+    if stmt is not None:
+        await db.execute(stmt)
+
+def get_rollups(db: Session, user_id: int, period: str, limit: int):
+    """
+    Get a user's most recent rollups for a period, newest first.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The user ID.
+        period (str): 'week' or 'month'.
+        limit (int): The maximum number of periods.
+
+    Returns:
+        list: Dicts with the period start, entry count and per-metric avg/min/max.
+    """
+    rollups = db.execute(
+        select(ProgressRollup)
+        .where(ProgressRollup.user_id == user_id, ProgressRollup.period == period)
+        .order_by(ProgressRollup.period_start.desc())
+        .limit(limit)
+    ).scalars().all()
+
+    report = []
+    for rollup in rollups:
+        entry = {"period_start": rollup.period_start, "entry_count": rollup.entry_count}
+        for metric in ROLLUP_METRICS:
+            count = getattr(rollup, f"{metric}_count")
+            entry[metric] = {
+                "avg": getattr(rollup, f"{metric}_sum") / count if count else None,
+                "min": getattr(rollup, f"{metric}_min"),
+                "max": getattr(rollup, f"{metric}_max"),
+            }
+        report.append(entry)
+    return report
+
+def backfill_rollups(engine):
+    """
+    Rebuild every rollup from the progress table.
+
+    The rollup table is locked for the rebuild, so entries recorded meanwhile
+    wait and are folded in on top of it rather than being lost or counted twice.
+
+    Args:
+        engine: The database engine.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    aggregates = ",\n".join(
+        f"COUNT({metric}), SUM({metric}), MIN({metric}), MAX({metric})" for metric in ROLLUP_METRICS
+    )
+    columns = ", ".join(
+        f"{metric}_count, {metric}_sum, {metric}_min, {metric}_max" for metric in ROLLUP_METRICS
+    )
+    written = 0
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE progress_rollups IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text("DELETE FROM progress_rollups"))
+        for period in PERIODS:
+            result = conn.execute(text(f"""
+                INSERT INTO progress_rollups (user_id, period, period_start, entry_count, {columns})
+                SELECT user_id, :period, date_trunc(:period, date), COUNT(*),
+                       {aggregates}
+                FROM progress_tracking
+                WHERE user_id IS NOT NULL AND date IS NOT NULL
+                GROUP BY user_id, date_trunc(:period, date)
+            """), {"period": period})
+            written += result.rowcount
+    return written
+
+if __name__ == "__main__":
+    from database import Base, engine
+    from migrations import upgrade_schema
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    print(f"Backfilled {backfill_rollups(engine)} progress rollups")
@@ -0,0 +1,183 @@
+from sqlalchemy import bindparam, case, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models.progress import Progress
+from models.progress_stats import UserProgressStats
+from services.progress_rollup_service import record_rollups, record_rollups_async
+
+def progress_stats_rows(entries):
+    """
+    Aggregate progress entries into one stats row per user.
+
+    Args:
+        entries (list): Progress entries (anything with user_id, date and stress_level).
+
+    Returns:
+        list: Stats row dicts, skipping entries without a stress level.
+    """
+    rows = {}
+    for entry in entries:
+        if entry.stress_level is None:
+            continue
+        row = rows.get(entry.user_id)
+        if row is None:
+            rows[entry.user_id] = {
+                "user_id": entry.user_id,
+                "initial_stress_level": entry.stress_level,
+                "initial_date": entry.date,
+                "latest_stress_level": entry.stress_level,
+                "latest_date": entry.date,
+                "entry_count": 1,
+                "mean_stress_level": entry.stress_level,
+            }
+            continue
+        if entry.date < row["initial_date"]:
+            row["initial_stress_level"], row["initial_date"] = entry.stress_level, entry.date
+        if entry.date >= row["latest_date"]:
+            row["latest_stress_level"], row["latest_date"] = entry.stress_level, entry.date
+        row["mean_stress_level"] = (row["mean_stress_level"] * row["entry_count"] + entry.stress_level) / (row["entry_count"] + 1)
+        row["entry_count"] += 1
+    return list(rows.values())
+
+def progress_stats_upsert(entries):
+    """
+    Build the statement folding newly inserted progress entries into their users' running stats.
+
+    The stats rows are upserted in a single statement, so entries recorded
+    concurrently from several workers are all counted.
+
+    Args:
+        entries (list): The inserted progress entries.
+
+    Returns:
+        The upsert statement, or None if no entry has a stress level.
+    """
+    rows = progress_stats_rows(entries)
+    if not rows:
+        return None
+
+    stats = UserProgressStats.__table__.c
+    stmt = insert(UserProgressStats).values(rows)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[stats.user_id],
+        set_={
+            # Entries may arrive out of date order, so initial/latest follow the entry dates
+            "initial_stress_level": case(
+                (new.initial_date < stats.initial_date, new.initial_stress_level),
+                else_=stats.initial_stress_level,
+            ),
+            "initial_date": func.least(stats.initial_date, new.initial_date),
+            "latest_stress_level": case(
+                (new.latest_date >= stats.latest_date, new.latest_stress_level),
+                else_=stats.latest_stress_level,
+            ),
+            "latest_date": func.greatest(stats.latest_date, new.latest_date),
+            "entry_count": stats.entry_count + new.entry_count,
+            "mean_stress_level": (
+                stats.mean_stress_level * stats.entry_count + new.mean_stress_level * new.entry_count
+            ) / (stats.entry_count + new.entry_count),
+        },
+    )
+
+# Creates the stats rows of users that have progress history but no stats yet.
+# Rows created meanwhile by another transaction are left alone.
+PROGRESS_STATS_SEED_SQL = text("""
+    INSERT INTO user_progress_stats (
+        user_id, initial_stress_level, initial_date, latest_stress_level, latest_date,
+        entry_count, mean_stress_level
+    )
+    SELECT user_id,
+           (array_agg(stress_level ORDER BY date, id))[1],
+           min(date),
+           (array_agg(stress_level ORDER BY date DESC, id DESC))[1],
+           max(date),
+           count(*),
+           avg(stress_level)
+    FROM progress_tracking
+    WHERE user_id IN :user_ids AND stress_level IS NOT NULL AND date IS NOT NULL
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO NOTHING
+    RETURNING user_id
+""").bindparams(bindparam("user_ids", expanding=True))
+
+def _stats_user_ids(entries):
+    return sorted({entry.user_id for entry in entries if entry.stress_level is not None})
+
+def _existing_stats(user_ids):
+    return select(UserProgressStats.user_id).where(UserProgressStats.user_id.in_(user_ids))
+
+def record_progress(db: Session, progress: Progress):
+    """
+    Fold a newly inserted progress entry into the user's running stats and
+    period rollups. The caller commits.
+
+    Args:
+        db (Session): The database session.
+        progress (Progress): The inserted progress entry.
+    """
+    record_progress_batch(db, [progress])
+
+def record_progress_batch(db: Session, entries):
+    """
+    Fold newly inserted progress entries into their users' running stats and
+    period rollups with one statement each. The caller commits.
+
+    The entries must already be inserted. Users without a stats row are
+    seeded from their whole history, these entries included, instead of
+    starting their stats from these entries alone.
+
+    Args:
+        db (Session): The database session.
+        entries (list): The inserted progress entries.
+    """
+    user_ids = _stats_user_ids(entries)
+    if user_ids:
+        existing = set(db.execute(_existing_stats(user_ids)).scalars())
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        seeded = set(db.execute(PROGRESS_STATS_SEED_SQL, {"user_ids": missing}).scalars()) if missing else set()
+        stmt = progress_stats_upsert([entry for entry in entries if entry.user_id not in seeded])
+        if stmt is not None:
+            db.execute(stmt)
+    record_rollups(db, entries)
+
+async def record_progress_async(db: AsyncSession, progress: Progress):
+    """
+    Async variant of record_progress. The caller commits.
+
+    Args:
+        db (AsyncSession): The async database session.
+        progress (Progress): The progress entry, inserted or pending in the session.
+    """
+    if progress.stress_level is not None:
+        # Insert a pending entry first, so a seed from history includes it
+        await db.flush()
+        existing = (await db.execute(_existing_stats([progress.user_id]))).scalars().first()
+        seeded = None
+        if existing is None:
+            seeded = (await db.execute(PROGRESS_STATS_SEED_SQL, {"user_ids": [progress.user_id]})).scalars().first()
+        if seeded is None:
+            await db.execute(progress_stats_upsert([progress]))
+    await record_rollups_async(db, [progress])
+
+async def get_progress_stats(db: AsyncSession, user_id: int):
+    """
+    Get the user's running progress stats.
+
+    Users whose entries predate the stats table are seeded from their progress
+    history on first access; every later lookup is a primary key read.
+
+    Args:
+        db (AsyncSession): The async database session.
+        user_id (int): The user ID.
+
+    Returns:
+        UserProgressStats: The stats, or None if the user has no progress entries.
+    """
+    stats = await db.get(UserProgressStats, user_id)
+    if stats is not None:
+        return stats
+    await db.execute(PROGRESS_STATS_SEED_SQL, {"user_ids": [user_id]})
+    await db.commit()
+    return await db.get(UserProgressStats, user_id)
@@ -0,0 +1,176 @@
+import os
+import time
+from datetime import datetime
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.progress import Progress
+from models.progress_trend import ProgressTrend
+from services.progress_rollup_service import ROLLUP_METRICS
+
+# Trend settings
+TREND_EMA_ALPHA = float(os.getenv("TREND_EMA_ALPHA", "0.3"))
+TREND_WRITE_BATCH_SIZE = int(os.getenv("TREND_WRITE_BATCH_SIZE", "5000"))
+
+def compute_trends(user_ids, dates, values, alpha: float = TREND_EMA_ALPHA):
+    """
+    Compute per-user trends of one metric in a single vectorized pass.
+
+    The input holds the entries of many users, grouped by user and in date
+    order within each user. Entries whose value is NaN are ignored.
+
+    For each user this gives the least-squares slope of the value over time
+    (per day), the exponential moving average of the values in entry order
+    (seeded with the first value) and the volatility (population standard
+    deviation of the values).
+
+    Args:
+        user_ids (np.ndarray): User ID of each entry.
+        dates (np.ndarray): datetime64 date of each entry.
+        values (np.ndarray): Float metric value of each entry.
+        alpha (float): The EMA smoothing factor.
+
+    Returns:
+        dict: Arrays user_id, entry_count, slope_per_day, ema, volatility and
+            last_entry_date, one element per user.
+    """
+    keep = ~np.isnan(values)
+    user_ids, dates, values = user_ids[keep], dates[keep], values[keep]
+    if not len(user_ids):
+        empty = np.array([])
+        return {"user_id": empty, "entry_count": empty, "slope_per_day": empty,
+                "ema": empty, "volatility": empty, "last_entry_date": empty}
+
+    # Group boundaries: each user's entries are one contiguous run
+    starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(user_ids)])
+    group = np.repeat(np.arange(len(starts)), counts)
+    position = np.arange(len(user_ids)) - starts[group]
+
+    # Days since each user's first entry, which keeps the sums small and well conditioned
+    days = dates.astype("datetime64[us]").astype(np.int64) / 86_400_000_000
+    x = days - days[starts][group]
+
+    n = counts.astype(np.float64)
+    sum_x = np.add.reduceat(x, starts)
+    sum_y = np.add.reduceat(values, starts)
+    sum_xx = np.add.reduceat(x * x, starts)
+    sum_xy = np.add.reduceat(x * values, starts)
+    sum_yy = np.add.reduceat(values * values, starts)
+
+    denominator = n * sum_xx - sum_x * sum_x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # A user whose entries all share one date has no slope
+        slope = np.where(denominator > 0, (n * sum_xy - sum_x * sum_y) / denominator, 0.0)
+
+    # Closed form of ema_k = alpha * y_k + (1 - alpha) * ema_(k-1) with ema_0 = y_0
+    decay = (1 - alpha) ** (counts[group] - 1 - position)
+    weights = np.where(position == 0, decay, alpha * decay)
+    ema = np.add.reduceat(weights * values, starts)
+
+    mean = sum_y / n
+    volatility = np.sqrt(np.maximum(sum_yy / n - mean * mean, 0.0))
+
+    return {
+        "user_id": user_ids[starts],
+        "entry_count": counts,
+        "slope_per_day": slope,
+        "ema": ema,
+        "volatility": volatility,
+        "last_entry_date": dates[starts + counts - 1],
+    }
+
+def load_progress_arrays(conn):
+    """
+    Load every progress entry as column arrays, grouped by user and in date order.
+
+    Args:
+        conn: A database connection.
+
+    Returns:
+        tuple: user_ids, dates and a dict of float metric arrays (NaN for missing values).
+    """
+    rows = conn.execute(
+        select(Progress.user_id, Progress.date, *(getattr(Progress, metric) for metric in ROLLUP_METRICS))
+        .where(Progress.user_id.isnot(None), Progress.date.isnot(None))
+        .order_by(Progress.user_id, Progress.date, Progress.id)
+    ).all()
+    columns = list(zip(*rows)) if rows else [()] * (2 + len(ROLLUP_METRICS))
+    user_ids = np.array(columns[0], dtype=np.int64)
+    dates = np.array(columns[1], dtype="datetime64[us]")
+    metrics = {
+        metric: np.array(column, dtype=np.float64)  # None becomes NaN
+        for metric, column in zip(ROLLUP_METRICS, columns[2:])
+    }
+    return user_ids, dates, metrics
+
+def refresh_trends(engine):
+    """
+    Recompute the trends of every user and metric and store them in progress_trends.
+
+    Args:
+        engine: The database engine.
+
+    Returns:
+        int: The number of trend rows written.
+    """
+    computed_at = datetime.utcnow()
+    with engine.connect() as conn:
+        user_ids, dates, metrics = load_progress_arrays(conn)
+
+    rows = []
+    for metric, values in metrics.items():
+        trends = compute_trends(user_ids, dates, values)
+        rows.extend(
+            {
+                "user_id": int(user_id),
+                "metric": metric,
+                "entry_count": int(entry_count),
+                "slope_per_day": float(slope),
+                "ema": float(ema),
+                "volatility": float(volatility),
+                "last_entry_date": last_entry_date.astype(datetime),
+                "computed_at": computed_at,
+            }
+            for user_id, entry_count, slope, ema, volatility, last_entry_date in zip(
+                trends["user_id"], trends["entry_count"], trends["slope_per_day"],
+                trends["ema"], trends["volatility"], trends["last_entry_date"],
+            )
+        )
+
+    stmt = insert(ProgressTrend)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProgressTrend.user_id, ProgressTrend.metric],
+        set_={column: stmt.excluded[column] for column in (
+            "entry_count", "slope_per_day", "ema", "volatility", "last_entry_date", "computed_at",
+        )},
+    )
+    with engine.begin() as conn:
+        for offset in range(0, len(rows), TREND_WRITE_BATCH_SIZE):
+            conn.execute(stmt, rows[offset:offset + TREND_WRITE_BATCH_SIZE])
+        # Users whose entries were all removed keep no stale trend
+        conn.execute(ProgressTrend.__table__.delete().where(ProgressTrend.computed_at < computed_at))
+    return len(rows)
+
+async def get_trend(db: AsyncSession, user_id: int, metric: str):
+    """
+    Get the stored trend of one of a user's metrics.
+
+    Args:
+        db (AsyncSession): The async database session.
+        user_id (int): The user ID.
+        metric (str): The Progress metric column name.
+
+    Returns:
+        ProgressTrend: The trend, or None if it has not been computed.
+    """
+    return await db.get(ProgressTrend, (user_id, metric))
+
+if __name__ == "__main__":
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    written = refresh_trends(engine)
+    print(f"Computed {written} progress trends in {time.perf_counter() - started:.2f}s")
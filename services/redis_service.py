@@ -0,0 +1,30 @@
+import os
+import redis
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+load_dotenv()  # Load environment variables from .env file
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Shared Redis connections: blocking for sync routes, asyncio for Socket.IO handlers
+redis_client = redis.StrictRedis.from_url(REDIS_URL)
+async_redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
+
+def subscribe(channel: str, handler):
+    """
+    Call handler with the data of every message published on a channel.
+
+    The subscription runs in a daemon thread of this process, so handlers must be
+    thread-safe and quick.
+
+    Args:
+        channel (str): The pub/sub channel.
+        handler (callable): Called with the message data (bytes).
+
+    Returns:
+        The worker thread; call its stop() method to unsubscribe.
+    """
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{channel: lambda message: handler(message["data"])})
+    return pubsub.run_in_thread(sleep_time=1.0, daemon=True)
@@ -0,0 +1,53 @@
+import os
+from services.redis_service import async_redis_client
+
+# Idle time after which an active conversation session is forgotten
+CONV_SESSION_TTL_SECONDS = int(os.getenv("CONV_SESSION_TTL_SECONDS", "7200"))
+
+def _session_key(user_id: int):
+    return f"conv_session:active:{user_id}"
+
+async def get_active_session(user_id: int):
+    """
+    Look up the user's active conversation session and extend its TTL.
+
+    Args:
+        user_id (int): The user ID.
+
+    Returns:
+        str: The session UUID, or None if the user has no active session.
+    """
+    return await async_redis_client.getex(_session_key(user_id), ex=CONV_SESSION_TTL_SECONDS)
+
+async def claim_session(user_id: int, session_id: str):
+    """
+    Register a session as the user's active one unless another worker got there first.
+
+    Args:
+        user_id (int): The user ID.
+        session_id (str): The candidate session UUID.
+
+    Returns:
+        str: The session UUID that is active after the call, which is either
+            session_id or the one registered concurrently by another worker.
+    """
+    key = _session_key(user_id)
+    while True:
+        if await async_redis_client.set(key, session_id, nx=True, ex=CONV_SESSION_TTL_SECONDS):
+            return session_id
+        existing = await async_redis_client.getex(key, ex=CONV_SESSION_TTL_SECONDS)
+        if existing:
+            return existing
+        # The winner's key expired or was ended in between; try again
+
+async def end_active_session(user_id: int):
+    """
+    Atomically remove the user's active session.
+
+    Args:
+        user_id (int): The user ID.
+
+    Returns:
+        str: The session UUID that was active, or None if there was none.
+    """
+    return await async_redis_client.getdel(_session_key(user_id))
@@ -1,21 +1,102 @@
-from sqlalchemy.orm import Session
-from services.auth_service import User, validate_access_token
-from services.ai_service import get_answer, process_audio_to_text, get_advanced_answer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.auth_service import validate_access_token_async, resolve_token_user
+from services.ai_service import get_answer, process_audio_to_text, get_advanced_answer, stream_answer, stream_advanced_answer
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from services.notification_service import generate_notifications
+from services.notification_service import generate_notifications, get_improvement_percentage
+from services.context_service import build_context
+from services.progress_stats_service import record_progress_async
 from jose import JWTError
 import socketio
-from database import SessionLocal
+from database import AsyncSessionLocal
 from models.conv_session import ConvSession
-from models.conversation_history import ConversationHistory
+from services.history_writer import history_writer
 from models.progress import Progress
+from services.redis_service import REDIS_URL
+from services.session_registry import get_active_session, claim_session, end_active_session
+from services.subscription_quota_service import SessionQuotaExceeded, consume_session, refund_session
 from datetime import datetime
+import uuid
 
-sio = socketio.AsyncServer(cors_allowed_origins='*', async_mode='asgi')
+# The Redis manager relays emits to clients of other workers; replies to a
+# handler's own client are sent locally by reply()
+client_manager = socketio.AsyncRedisManager(REDIS_URL)
+sio = socketio.AsyncServer(cors_allowed_origins='*', async_mode='asgi', client_manager=client_manager)
 
-active_sessions = {}
+async def reply(sid, event: str, data):
+    """
+    Emit an event to a client of this worker.
+
+    Handlers run in the process holding the caller's connection, so replies to
+    the caller are sent directly; only emits to clients of other workers need
+    the Redis relay, which pickles every message to all workers.
+
+    Args:
+        sid (str): Session ID of a client connected to this process.
+        event (str): The event name.
+        data: The event payload.
+    """
+    await sio.emit(event, data, to=sid, ignore_queue=True)
+
+async def get_or_create_session(db: AsyncSession, user_id: int):
+    """
+    Return the user's active conversation session, creating one if needed.
+
+    The session row is committed before it is registered in Redis, so a session id
+    seen by any worker always exists in the database. If another worker registers
+    a session for the same user first, the row created here is discarded.
+    Only starting a new session counts against the user's subscription quota.
+
+    Args:
+        db (AsyncSession): The async database session.
+        user_id (int): The user ID.
+
+    Returns:
+        uuid.UUID: The active session UUID.
+
+    Raises:
+        SessionQuotaExceeded: If a new session is needed but the quota is used up.
+    """
+    session_id = await get_active_session(user_id)
+    if session_id:
+        return uuid.UUID(session_id)
+
+    await consume_session(db, user_id)
+    try:
+        new_session = ConvSession(user_id=user_id, session_id=uuid.uuid4())
+        db.add(new_session)
+        await db.commit()
+        candidate_id = str(new_session.session_id)
+        session_id = await claim_session(user_id, candidate_id)
+    except Exception:
+        await refund_session(user_id)
+        raise
+    if session_id != candidate_id:
+        # Another worker started the session and counted it
+        await refund_session(user_id)
+        await db.delete(new_session)
+        await db.commit()
+    return uuid.UUID(session_id)
+
+async def emit_streamed_response(sid, chunks):
+    """
+    Forward a streamed AI reply to the client as it is generated.
+
+    Args:
+        sid (str): Session ID.
+        chunks: Async iterator of text chunks from the AI service.
+
+    Returns:
+        str: The assembled reply.
+    """
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        await reply(sid, 'ai_response_chunk', {'chunk': chunk})
+    response = "".join(parts)
+    await reply(sid, 'ai_response_done', {'response': response})
+    return response
 
 @sio.event
 async def connect(sid, environ, auth):
@@ -32,30 +113,51 @@ async def connect(sid, environ, auth):
         HTTPException: If there is an error during token validation or notification generation.
     """
     print(f"Auth data received: {auth}")
-    db: Session = SessionLocal()
     try:
         if not auth or 'token' not in auth:
             raise JWTError("Missing authorization token")
 
         # Extract and validate token
         token = auth['token'].split(" ")[1]
-        user = validate_access_token(token)  # This will raise JWTError if token is invalid
+        user = await validate_access_token_async(token)  # This will raise HTTPException if token is invalid
         username = user['sub']
         print(f"User {user['sub']} connected with session {sid}")
-        notification_message = await generate_notifications(username, db)
-        print(notification_message)
-        await sio.emit('first_notification', {'notification': notification_message}, to=sid)
+        # Generate the first notification after the handshake instead of holding it up
+        sio.start_background_task(send_first_notification, sid, username, auth.get('language', 'en'))
     except HTTPException as e:
         # Emit the error to the client
         print(f"Auth error: {e.detail}")
-        await sio.emit('auth_error', {'code': e.status_code, 'message': e.detail}, to=sid)
+        await reply(sid, 'auth_error', {'code': e.status_code, 'message': e.detail})
         await sio.disconnect(sid)  # Disconnect after sending errors
     except Exception as e:
         # Handle general exceptions
         print(f"Unexpected error during connection: {e}")
-        await sio.emit('auth_error', {'code': 500, 'message': 'Internal server error'}, to=sid)
+        await reply(sid, 'auth_error', {'code': 500, 'message': 'Internal server error'})
         await sio.disconnect(sid)
     
+async def send_first_notification(sid, username: str, language: str):
+    """
+    Generate and emit the notification shown right after connecting.
+
+    Args:
+        sid (str): Session ID.
+        username (str): The connected user's username.
+        language (str): The locale requested in the auth data.
+    """
+    try:
+        # The database session is only held while loading the progress, not during generation
+        async with AsyncSessionLocal() as db:
+            improvement_percentage = await get_improvement_percentage(username, db)
+        notification_message = await generate_notifications(improvement_percentage, language)
+        print(notification_message)
+        await reply(sid, 'first_notification', {'notification': notification_message})
+    except HTTPException as e:
+        print(f"Auth error: {e.detail}")
+        await reply(sid, 'auth_error', {'code': e.status_code, 'message': e.detail})
+        await sio.disconnect(sid)
+    except Exception as e:
+        print(f"Error generating first notification: {e}")
+
 # Handle AI conversation via Socket.IO
 @sio.event
 async def user_message(sid, data):
@@ -66,16 +168,22 @@ async def user_message(sid, data):
         # Process the message
         message = data.get("text")
         is_voice = data.get("is_voice", False)
+        stream = data.get("stream", False)
         token = data.get("token")
         if not token:
             raise JWTError("Missing authorization token")
         
-        user = validate_access_token(token)  # Validate the token
+        user = await validate_access_token_async(token)  # Validate the token
         
         print(f"User {user['sub']} is sending a message with session {sid}")
 
         if is_voice:
-            text = await process_audio_to_text(message)  # Placeholder function
+            try:
+                text = await process_audio_to_text(message)
+            except ValueError as e:
+                # Unusable clip, busy or slow recognizer: tell the client without dropping the connection
+                await reply(sid, 'voice_error', {'message': str(e)})
+                return
             print(f"Received voice input, transcribed to: {text}")
         else:
             text = message
@@ -93,6 +201,11 @@ async def user_message(sid, data):
         # Combine user input with instructions
         input_text = f"{therapy_instructions}\n\nUser input: {text}"  
 
+        if stream:
+            # Emit the AI response chunk by chunk as it is generated
+            await emit_streamed_response(sid, stream_answer(input_text))
+            return
+
         # Process the text input with AI
         ai_response = await get_answer(input_text)
         
@@ -100,150 +213,131 @@ async def user_message(sid, data):
         response_data = {"response": ai_response.get('response') if isinstance(ai_response, dict) else ai_response}
         
         # Emit the AI response back to the client
-        await sio.emit('ai_response', response_data, to=sid)
+        await reply(sid, 'ai_response', response_data)
 
     except HTTPException as e:
         # Handle token validation issues
         print(f"Token error during message processing: {e.detail}")
-        await sio.emit('auth_error', {'code': e.status_code, 'message': e.detail}, to=sid)
+        await reply(sid, 'auth_error', {'code': e.status_code, 'message': e.detail})
         await sio.disconnect(sid)  # Disconnect user on token issues
 
     except Exception as e:
         # General error handling
         print(f"Unexpected error during message processing: {e}")
-        await sio.emit('auth_error', {'code': 500, 'message': 'Internal server error'}, to=sid)
+        await reply(sid, 'auth_error', {'code': 500, 'message': 'Internal server error'})
         await sio.disconnect(sid)
 
 
 @sio.event
 async def user_message_advanced(sid, data):
     print(f"Received advanced message from {sid}: {data}")  # Log to check if data is received
-    db: Session = SessionLocal()
     try:
         message = data.get("text")
+        stream = data.get("stream", False)
         token = data.get("token")
         if not token:
             raise JWTError("Missing authorization token")
-        
-        user = validate_access_token(token)
-        user_name = user['sub']
-        user_record = db.query(User).filter(User.username == user_name).first()
-        user_id = user_record.id if user_record else None
-
-        print(f"User ID: {user_id}")
-
-        if not user_id:
-            raise JWTError("User not found")
-
-        # Check if there's an active session for the user
-        if user_id not in active_sessions:
-            # Create a new session in the database
-            new_session = ConvSession(user_id=user_id)
-            db.add(new_session)
-            db.commit()
-            db.refresh(new_session)
-            active_sessions[user_id] = str(new_session.session_id)
-        session_id = active_sessions[user_id]
-        
-        # Save user message to the conversation history
-        new_message = ConversationHistory(
-            session_id=session_id,
-            role="user",
-            message=message
-        )
-        db.add(new_message)
-        db.commit()
-        # Fetch session conversation history
-        conversation_history = db.query(ConversationHistory).filter_by(session_id=session_id).all()
-        print(f"Conversation history: {conversation_history}")
-        # Prepare AI input
-        instructions = (
-            "You are a virtual therapist. Use the conversation history to reflect on past questions and answers. "
-            "Build on the user's input and avoid repeating yourself. Provide empathetic, supportive, and actionable guidance "
-            "when sufficient context is available. Summarize key points before offering suggestions."
-        )
-        conversation_input = [{"role": "system", "content": instructions}] + [
-            {"role": msg.role, "content": msg.message} for msg in conversation_history
-        ]
+        if not isinstance(message, str) or not message.strip():
+            await reply(sid, 'message_error', {'message': 'Message text is required'})
+            return
+
+        # The database session is only held while preparing the turn, not during generation
+        async with AsyncSessionLocal() as db:
+            user, user_id = await resolve_token_user(token, db)
+
+            print(f"User ID: {user_id}")
+
+            if not user_id:
+                raise JWTError("User not found")
+
+            # Reuse the user's active session or start a new one
+            session_id = await get_or_create_session(db, user_id)
+
+            # Queue the user message for the batched conversation history writer
+            history_writer.enqueue(session_id, "user", message)
+            # Prepare AI input from the rolling summary and the most recent turns
+            instructions = (
+                "You are a virtual therapist. Use the conversation history to reflect on past questions and answers. "
+                "Build on the user's input and avoid repeating yourself. Provide empathetic, supportive, and actionable guidance "
+                "when sufficient context is available. Summarize key points before offering suggestions."
+            )
+            conversation_input = await build_context(db, session_id, instructions)
         print(f"Conversation input: {conversation_input}")
-        # Process conversation with AI
-        ai_response = await get_advanced_answer(conversation_input)
-        print(f"AI response: {ai_response}")
-        # Save AI response to the conversation history
-        new_ai_response = ConversationHistory(
-            session_id=session_id,
-            role="assistant",
-            message=ai_response.get('response') if isinstance(ai_response, dict) else ai_response
-        )
-        db.add(new_ai_response)
-        db.commit()
-        # Emit the AI response back to the client
-        response_data = {"response": new_ai_response.message}
-        await sio.emit('ai_response', response_data, to=sid)
+        if stream:
+            # Emit the AI response chunk by chunk, persisting the assembled text once at the end
+            response_text = await emit_streamed_response(sid, stream_advanced_answer(conversation_input))
+        else:
+            # Process conversation with AI
+            ai_response = await get_advanced_answer(conversation_input)
+            print(f"AI response: {ai_response}")
+            response_text = ai_response.get('response') if isinstance(ai_response, dict) else ai_response
+        # Queue the AI response for the batched conversation history writer
+        history_writer.enqueue(session_id, "assistant", response_text)
+        if not stream:
+            # Emit the AI response back to the client
+            response_data = {"response": response_text}
+            await reply(sid, 'ai_response', response_data)
+    except SessionQuotaExceeded:
+        await reply(sid, 'quota_exceeded', {'message': 'No sessions left in the current billing cycle'})
     except JWTError as e:
         print(f"JWT Error: {e}")
-        await sio.emit('auth_error', {'code': 401, 'message': 'Unauthorized'}, to=sid)
+        await reply(sid, 'auth_error', {'code': 401, 'message': 'Unauthorized'})
         await sio.disconnect(sid)
     except Exception as e:
         print(f"Unexpected error during message processing: {e}")
-        await sio.emit('auth_error', {'code': 500, 'message': 'Internal server error'}, to=sid)
-    finally:
-        db.close()
+        await reply(sid, 'auth_error', {'code': 500, 'message': 'Internal server error'})
 
 
 @sio.event
 async def end_session(sid, data):
-    db: Session = SessionLocal()
     try:
         token = data.get("token")
         if not token:
             raise JWTError("Missing authorization token")
-        
-        user = validate_access_token(token)
-        user_name = user['sub']
-        user_record = db.query(User).filter(User.username == user_name).first()
-        user_id = user_record.id if user_record else None
-
-        if not user_id:
-            raise JWTError("User not found")
-
-
-        # Save the updated progress data
-        progress_data = {
-            "user_id": user_id,
-            "date": datetime.utcnow(),
-            "stress_level": data.get("stress_level"),
-            "negative_thoughts_reduction": data.get("negative_thoughts_reduction"),
-            "positive_thoughts_increase": data.get("positive_thoughts_increase")
-        }
-        new_progress = Progress(**progress_data)
-        db.add(new_progress)
-        db.commit()
-
-        # Mark session as completed
-        if user_id in active_sessions:
-            print(active_sessions)
-            session_id = active_sessions[user_id]
-            session = db.query(ConvSession).filter_by(session_id=session_id).first()
-            if session:
-                session.end_time = datetime.utcnow()
-                session.is_completed = True
-                db.commit()
-                del active_sessions[user_id]
-                await sio.emit('session_ended', {"message": "Session ended successfully"}, to=sid)
+
+        async with AsyncSessionLocal() as db:
+            user, user_id = await resolve_token_user(token, db)
+
+            if not user_id:
+                raise JWTError("User not found")
+
+
+            # Save the updated progress data
+            progress_data = {
+                "user_id": user_id,
+                "date": datetime.utcnow(),
+                "stress_level": data.get("stress_level"),
+                "negative_thoughts_reduction": data.get("negative_thoughts_reduction"),
+                "positive_thoughts_increase": data.get("positive_thoughts_increase")
+            }
+            new_progress = Progress(**progress_data)
+            db.add(new_progress)
+            await record_progress_async(db, new_progress)
+            await db.commit()
+
+            # Mark session as completed
+            session_id = await end_active_session(user_id)
+            if session_id:
+                print(f"Ending session {session_id} for user {user_id}")
+                session = (await db.execute(
+                    select(ConvSession).where(ConvSession.session_id == uuid.UUID(session_id))
+                )).scalars().first()
+                if session:
+                    session.end_time = datetime.utcnow()
+                    session.is_completed = True
+                    await db.commit()
+                    await reply(sid, 'session_ended', {"message": "Session ended successfully"})
+                else:
+                    await reply(sid, 'session_error', {"message": "Session not found"})
             else:
-                await sio.emit('session_error', {"message": "Session not found"}, to=sid)
-        else:
-            await sio.emit('session_error', {"message": "No active session found"}, to=sid)
+                await reply(sid, 'session_error', {"message": "No active session found"})
 
     except JWTError as e:
         print(f"JWT Error: {e}")
-        await sio.emit('auth_error', {'code': 401, 'message': 'Unauthorized'}, to=sid)
+        await reply(sid, 'auth_error', {'code': 401, 'message': 'Unauthorized'})
     except Exception as e:
         print(f"Error ending session: {e}")
-        await sio.emit('session_error', {"message": "Internal server error"}, to=sid)
-    finally:
-        db.close()
+        await reply(sid, 'session_error', {"message": "Internal server error"})
 
 @sio.event
 async def disconnect(sid):
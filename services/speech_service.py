@@ -0,0 +1,262 @@
+import abc
+import asyncio
+import base64
+import importlib
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import speech_recognition as sr
+
+# Speech-to-text settings
+SPEECH_RECOGNIZER = os.getenv("SPEECH_RECOGNIZER", "google")
+SPEECH_WORKERS = int(os.getenv("SPEECH_WORKERS", "2"))
+SPEECH_MAX_QUEUE = int(os.getenv("SPEECH_MAX_QUEUE", "8"))
+SPEECH_TIMEOUT = float(os.getenv("SPEECH_TIMEOUT", "30"))
+
+class SpeechRecognizer(abc.ABC):
+    """
+    Interface of a speech-to-text engine.
+
+    Recognizers run inside the speech worker processes: decode turns the raw
+    audio clip into whatever the engine consumes and recognize turns that into
+    text. Both raise ValueError with a user-facing message on failure.
+    """
+
+    @abc.abstractmethod
+    def decode(self, audio_bytes: bytes):
+        """
+        Turn a raw audio clip into the engine's input.
+        """
+
+    @abc.abstractmethod
+    def recognize(self, audio):
+        """
+        Turn decoded audio into text.
+        """
+
+class GoogleSpeechRecognizer(SpeechRecognizer):
+    """
+    Google Web Speech API through SpeechRecognition (network).
+    """
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+        # Bound the web request, so a hung call cannot hold its worker forever
+        self.recognizer.operation_timeout = SPEECH_TIMEOUT
+
+    def decode(self, audio_bytes: bytes):
+        with sr.AudioFile(io.BytesIO(audio_bytes)) as source:
+            return self.recognizer.record(source)  # Read the entire audio file
+
+    def recognize(self, audio):
+        try:
+            return self.recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            raise ValueError("Could not understand the audio")
+        except sr.RequestError:
+            raise ValueError("Could not request results from the speech recognition service")
+
+class SphinxSpeechRecognizer(GoogleSpeechRecognizer):
+    """
+    Offline CMU Sphinx engine (requires pocketsphinx).
+    """
+
+    def recognize(self, audio):
+        try:
+            return self.recognizer.recognize_sphinx(audio)
+        except sr.UnknownValueError:
+            raise ValueError("Could not understand the audio")
+        except sr.RequestError:
+            raise ValueError("Offline speech recognition is not available")
+
+class StaticSpeechRecognizer(SpeechRecognizer):
+    """
+    Deterministic stand-in that returns SPEECH_STATIC_TEXT for any clip.
+    """
+
+    def decode(self, audio_bytes: bytes):
+        return audio_bytes
+
+    def recognize(self, audio):
+        return os.getenv("SPEECH_STATIC_TEXT", "This is a transcribed voice message.")
+
+RECOGNIZERS = {
+    "google": GoogleSpeechRecognizer,
+    "sphinx": SphinxSpeechRecognizer,
+    "static": StaticSpeechRecognizer,
+}
+
+def load_recognizer(spec: str):
+    """
+    Instantiate a recognizer by registered name or by "module:ClassName" path.
+
+    Args:
+        spec (str): The recognizer name or import path.
+
+    Returns:
+        SpeechRecognizer: The recognizer instance.
+    """
+    if spec in RECOGNIZERS:
+        return RECOGNIZERS[spec]()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+# State of each worker process
+_worker_recognizer = None
+
+def _init_worker(spec: str):
+    global _worker_recognizer
+    _worker_recognizer = load_recognizer(spec)
+
+def _transcribe_in_worker(base64_audio: str):
+    started = time.perf_counter()
+    audio = _worker_recognizer.decode(base64.b64decode(base64_audio))
+    decoded = time.perf_counter()
+    text = _worker_recognizer.recognize(audio)
+    return text, decoded - started, time.perf_counter() - decoded
+
+# State of the serving process
+_pool = None
+_in_flight = 0
+_metrics = {
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "timed_out": 0,
+    "pool_restarts": 0,
+    "decode_seconds_total": 0.0,
+    "recognize_seconds_total": 0.0,
+    "last_decode_seconds": None,
+    "last_recognize_seconds": None,
+}
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Spawned rather than forked so workers do not inherit the server's sockets and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=SPEECH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(SPEECH_RECOGNIZER,),
+        )
+    return _pool
+
+def _discard_pool(pool):
+    """
+    Drop a broken or stuck pool so the next clip starts a fresh one.
+
+    Its worker processes are terminated, which fails the clips they are still
+    running and frees their slots.
+    """
+    global _pool
+    if _pool is pool:
+        _pool = None
+        _metrics["pool_restarts"] += 1
+        # ProcessPoolExecutor has no public way to stop a running worker
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+def _release_slot():
+    global _in_flight
+    _in_flight -= 1
+
+async def transcribe_audio(base64_audio: str):
+    """
+    Transcribe a Base64-encoded audio clip in the speech worker pool.
+
+    At most SPEECH_WORKERS clips are processed at once and SPEECH_MAX_QUEUE more
+    may wait; anything beyond that is rejected immediately so voice traffic
+    cannot pile up behind a slow recognizer. A clip keeps its slot until its
+    worker is done with it. If a worker process dies, or a clip is still
+    running after SPEECH_TIMEOUT, the pool is replaced for the next clip.
+
+    Args:
+        base64_audio (str): The Base64-encoded audio clip.
+
+    Returns:
+        str: The transcribed text.
+
+    Raises:
+        ValueError: If the clip cannot be transcribed, the pool is full or
+            transcription takes longer than SPEECH_TIMEOUT.
+    """
+    global _in_flight
+    if _in_flight >= SPEECH_WORKERS + SPEECH_MAX_QUEUE:
+        _metrics["rejected"] += 1
+        raise ValueError("Speech recognition is busy, please try again")
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        future = pool.submit(_transcribe_in_worker, base64_audio)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        _metrics["failed"] += 1
+        raise ValueError("Speech recognition failed, please try again")
+    _in_flight += 1
+
+    def on_done(_):
+        try:
+            loop.call_soon_threadsafe(_release_slot)
+        except RuntimeError:
+            pass  # The event loop is already closed
+
+    future.add_done_callback(on_done)
+    try:
+        text, decode_seconds, recognize_seconds = await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=SPEECH_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        # A queued clip is just cancelled; a running one may be stuck, so its pool is replaced
+        if not future.cancel():
+            _discard_pool(pool)
+        _metrics["timed_out"] += 1
+        raise ValueError("Speech recognition timed out")
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        _metrics["failed"] += 1
+        raise ValueError("Speech recognition failed, please try again")
+    except Exception:
+        _metrics["failed"] += 1
+        raise
+
+    _metrics["completed"] += 1
+    _metrics["decode_seconds_total"] += decode_seconds
+    _metrics["recognize_seconds_total"] += recognize_seconds
+    _metrics["last_decode_seconds"] = decode_seconds
+    _metrics["last_recognize_seconds"] = recognize_seconds
+    return text
+
+def speech_metrics():
+    """
+    Get a snapshot of the speech worker pool metrics.
+
+    Returns:
+        dict: Queue depth, in-flight clips, outcome counters and timings.
+    """
+    completed = _metrics["completed"]
+    return {
+        **_metrics,
+        "recognizer": SPEECH_RECOGNIZER,
+        "workers": SPEECH_WORKERS,
+        "max_queue": SPEECH_MAX_QUEUE,
+        "in_flight": _in_flight,
+        "queue_depth": max(0, _in_flight - SPEECH_WORKERS),
+        "avg_decode_seconds": _metrics["decode_seconds_total"] / completed if completed else None,
+        "avg_recognize_seconds": _metrics["recognize_seconds_total"] / completed if completed else None,
+    }
+
+def shutdown_speech_pool():
+    """
+    Stop the speech worker processes.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from services.subscription_quota_service import reset_quotas
+
+# Billing sweeper settings
+BILLING_CYCLE_DAYS = int(os.getenv("BILLING_CYCLE_DAYS", "30"))
+BILLING_SWEEP_INTERVAL = float(os.getenv("BILLING_SWEEP_INTERVAL", "60"))
+BILLING_SWEEP_CHUNK_SIZE = int(os.getenv("BILLING_SWEEP_CHUNK_SIZE", "1000"))
+
+# Renews one chunk of due subscriptions, walking ix_subscriptions_is_active_next_billing_date
+# from the (next_billing_date, id) cursor. Rows locked by another sweeper are skipped
+# and left to it. Each row moves by whole cycles to its first billing date after :now,
+# so a renewed row is no longer due and running the sweep again changes nothing.
+RENEW_DUE_CHUNK_SQL = text("""
+    WITH due AS (
+        SELECT id, next_billing_date
+        FROM subscriptions
+        WHERE is_active
+          AND next_billing_date <= :now
+          AND (next_billing_date, id) > (:after_date, :after_id)
+        ORDER BY next_billing_date, id
+        LIMIT :chunk_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE subscriptions s
+    SET sessions_used = 0,
+        next_billing_date = due.next_billing_date + make_interval(days => :cycle_days * (
+            floor(extract(epoch FROM :now - due.next_billing_date) / (:cycle_days * 86400))::int + 1
+        ))
+    FROM due
+    WHERE s.id = due.id
+    RETURNING s.id, s.user_id, due.next_billing_date AS due_date
+""")
+
+def next_billing_date(start: datetime):
+    """
+    Get the first billing date of a subscription starting at the given time.
+    """
+    return start + timedelta(days=BILLING_CYCLE_DAYS)
+
+def renew_due_chunk(db: Session, now: datetime, after: tuple, chunk_size: int = BILLING_SWEEP_CHUNK_SIZE):
+    """
+    Renew the next chunk of subscriptions due at the given time and commit.
+
+    Args:
+        db (Session): The database session.
+        now (datetime): The sweep time; subscriptions billed at or before it are due.
+        after (tuple): The (next_billing_date, id) cursor of the previous chunk.
+        chunk_size (int): The most subscriptions renewed.
+
+    Returns:
+        tuple: The renewed (id, user_id, due_date) rows and the cursor of the
+            next chunk, or None once no due subscription is left.
+    """
+    rows = db.execute(RENEW_DUE_CHUNK_SQL, {
+        "now": now,
+        "after_date": after[0],
+        "after_id": after[1],
+        "chunk_size": chunk_size,
+        "cycle_days": BILLING_CYCLE_DAYS,
+    }).all()
+    db.commit()
+    if not rows:
+        return rows, None
+    last = max(rows, key=lambda row: (row.due_date, row.id))
+    return rows, (last.due_date, last.id)
+
+def sweep_due_subscriptions(now: datetime = None, chunk_size: int = BILLING_SWEEP_CHUNK_SIZE):
+    """
+    Renew every subscription due at the given time: reset its session count
+    and advance its billing date.
+
+    Each chunk is its own short transaction, so the sweep never holds more than
+    chunk_size row locks, and any number of workers can sweep at once. The
+    cached session quotas of renewed users are dropped after each chunk.
+
+    Args:
+        now (datetime): The sweep time, defaults to the current UTC time.
+        chunk_size (int): The subscriptions renewed per transaction.
+
+    Returns:
+        int: The number of subscriptions renewed by this call.
+    """
+    now = now or datetime.utcnow()
+    cursor = (datetime.min, 0)
+    renewed = 0
+    with SessionLocal() as db:
+        while cursor is not None:
+            rows, cursor = renew_due_chunk(db, now, cursor, chunk_size)
+            reset_quotas([row.user_id for row in rows])
+            renewed += len(rows)
+    return renewed
+
+async def _run_billing_sweeper():
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            renewed = await loop.run_in_executor(None, sweep_due_subscriptions)
+            if renewed:
+                print(f"Renewed {renewed} subscriptions")
+        except Exception as e:
+            print(f"Billing sweep failed: {e}")
+        await asyncio.sleep(BILLING_SWEEP_INTERVAL)
+
+_sweeper_task = None
+
+def start_billing_sweeper():
+    """
+    Start the background task renewing due subscriptions every BILLING_SWEEP_INTERVAL seconds.
+    """
+    global _sweeper_task
+    _sweeper_task = asyncio.create_task(_run_billing_sweeper())
+
+async def stop_billing_sweeper():
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
+
+if __name__ == "__main__":
+    print(f"Renewed {sweep_due_subscriptions()} subscriptions")
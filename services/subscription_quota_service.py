@@ -0,0 +1,276 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, Integer, cast, column, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models.subscription import Subscription
+from services.redis_service import async_redis_client, redis_client
+
+# Sessions included per billing cycle; None means unlimited
+SESSION_QUOTAS = {
+    "pack_of_4": 4,
+    "unlimited": None,
+}
+# Sessions per calendar month for users without an active subscription, "unlimited" for no limit
+FREE_SESSION_QUOTA = os.getenv("FREE_SESSION_QUOTA", "unlimited")
+FREE_SESSION_QUOTA = None if FREE_SESSION_QUOTA.lower() == "unlimited" else int(FREE_SESSION_QUOTA)
+SESSION_QUOTA_TTL_SECONDS = int(os.getenv("SESSION_QUOTA_TTL_SECONDS", str(7 * 24 * 3600)))
+SESSION_QUOTA_RECONCILE_INTERVAL = float(os.getenv("SESSION_QUOTA_RECONCILE_INTERVAL", "15"))
+SESSION_QUOTA_DIRTY_KEY = "subscription:quota:dirty"
+
+class SessionQuotaExceeded(Exception):
+    """
+    Raised when a user has no sessions left in the current billing cycle.
+    """
+
+def _quota_key(user_id: int):
+    return f"subscription:quota:{user_id}"
+
+# Each user's quota is a hash {used, limit, cycle}; limit -1 is unlimited and
+# cycle is the next billing date the counts belong to, or "free:YYYY-MM" for the
+# free allowance of a calendar month. Free counters live only in Redis and expire
+# at the end of their month; subscription counters are reconciled to the database.
+# Returns the new usage, -1 if the quota is used up and -2 if the hash must be seeded.
+_CONSUME_SCRIPT = async_redis_client.register_script("""
+local key = KEYS[1]
+if redis.call('EXISTS', key) == 0 then
+    return -2
+end
+local used = tonumber(redis.call('HGET', key, 'used'))
+local limit = tonumber(redis.call('HGET', key, 'limit'))
+if limit >= 0 and used >= limit then
+    return -1
+end
+used = redis.call('HINCRBY', key, 'used', 1)
+if string.sub(redis.call('HGET', key, 'cycle'), 1, 5) ~= 'free:' then
+    redis.call('EXPIRE', key, ARGV[1])
+    redis.call('SADD', KEYS[2], ARGV[2])
+end
+return used
+""")
+
+# Give back one session if the hash still exists
+_REFUND_SCRIPT = async_redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'used', -1)
+if string.sub(redis.call('HGET', KEYS[1], 'cycle'), 1, 5) ~= 'free:' then
+    redis.call('SADD', KEYS[2], ARGV[1])
+end
+return 1
+""")
+
+# Seed the hash unless another worker already did; ARGV[5] is the end of a free
+# period as a Unix time, or 0 to use the sliding ARGV[4] TTL
+_SEED_SCRIPT = async_redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], 'used', ARGV[1], 'limit', ARGV[2], 'cycle', ARGV[3])
+    if tonumber(ARGV[5]) > 0 then
+        redis.call('EXPIREAT', KEYS[1], ARGV[5])
+    else
+        redis.call('EXPIRE', KEYS[1], ARGV[4])
+    end
+end
+return 1
+""")
+
+def quota_limit(subscription: Subscription):
+    """
+    Get the number of sessions a subscription allows per billing cycle.
+
+    Users without an active subscription, or with a subscription type not in
+    SESSION_QUOTAS, get the FREE_SESSION_QUOTA allowance per calendar month.
+
+    Args:
+        subscription (Subscription): The user's subscription, or None.
+
+    Returns:
+        int: The limit, or None if unlimited.
+    """
+    if subscription is None or not subscription.is_active:
+        return FREE_SESSION_QUOTA
+    return SESSION_QUOTAS.get(subscription.subscription_type, FREE_SESSION_QUOTA)
+
+def current_subscription(user_id: int):
+    """
+    Query for the subscription a user's quota is based on: their newest one.
+
+    Args:
+        user_id (int): The user ID.
+
+    Returns:
+        Select: The query, for a sync or async session.
+    """
+    return select(Subscription).where(Subscription.user_id == user_id).order_by(Subscription.id.desc()).limit(1)
+
+def _free_period(now: datetime = None):
+    """
+    Get the cycle name and end of the current free period, a UTC calendar month.
+    """
+    start = (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return f"free:{start:%Y-%m}", end
+
+def _cycle(subscription: Subscription):
+    if subscription is None or not subscription.is_active or subscription.subscription_type not in SESSION_QUOTAS:
+        return _free_period()[0]
+    return subscription.next_billing_date.isoformat() if subscription.next_billing_date else "none"
+
+async def _seed_quota(db: AsyncSession, user_id: int):
+    subscription = (await db.execute(current_subscription(user_id))).scalars().first()
+    limit = quota_limit(subscription)
+    cycle = _cycle(subscription)
+    if cycle.startswith("free:"):
+        used, expire_at = 0, int((_free_period()[1] - datetime(1970, 1, 1)).total_seconds())
+    else:
+        used, expire_at = subscription.sessions_used or 0, 0
+    await _SEED_SCRIPT(
+        keys=[_quota_key(user_id)],
+        args=[used, -1 if limit is None else limit, cycle, SESSION_QUOTA_TTL_SECONDS, expire_at],
+    )
+
+async def consume_session(db: AsyncSession, user_id: int):
+    """
+    Count a new conversation session against the user's quota.
+
+    The check and the increment are a single Redis script, so concurrent
+    session starts on any number of workers cannot overrun the quota and no
+    database lock is taken. The counter is seeded from the subscription on
+    first use and written back in batches by the quota reconciler.
+
+    Args:
+        db (AsyncSession): The async database session, only used for seeding.
+        user_id (int): The user ID.
+
+    Returns:
+        int: The sessions used in the current cycle, this one included.
+
+    Raises:
+        SessionQuotaExceeded: If the user has no sessions left.
+    """
+    keys = [_quota_key(user_id), SESSION_QUOTA_DIRTY_KEY]
+    args = [SESSION_QUOTA_TTL_SECONDS, user_id]
+    used = await _CONSUME_SCRIPT(keys=keys, args=args)
+    if used == -2:
+        await _seed_quota(db, user_id)
+        used = await _CONSUME_SCRIPT(keys=keys, args=args)
+    if used < 0:
+        raise SessionQuotaExceeded()
+    return used
+
+async def refund_session(user_id: int):
+    """
+    Give back a session counted by consume_session that was not started.
+    """
+    await _REFUND_SCRIPT(keys=[_quota_key(user_id), SESSION_QUOTA_DIRTY_KEY], args=[user_id])
+
+def live_sessions_used(subscription: Subscription):
+    """
+    Get the sessions a subscription used in its current cycle, including counts not yet reconciled.
+
+    Args:
+        subscription (Subscription): The subscription.
+
+    Returns:
+        int: The sessions used.
+    """
+    used, cycle = redis_client.hmget(_quota_key(subscription.user_id), ["used", "cycle"])
+    if used is not None and cycle is not None and cycle.decode() == _cycle(subscription):
+        return max(int(used), subscription.sessions_used or 0)
+    return subscription.sessions_used or 0
+
+def reset_quotas(user_ids: list):
+    """
+    Drop the cached quotas of users whose subscription changed, so they are seeded again.
+
+    Args:
+        user_ids (list): The user IDs.
+    """
+    if user_ids:
+        redis_client.delete(*(_quota_key(user_id) for user_id in user_ids))
+
+async def reconcile_quotas(batch_size: int = 1000):
+    """
+    Write the session counts of recently active users back to their subscriptions in one UPDATE.
+
+    Counts are only written to the billing cycle they were made in, so a
+    reconcile racing with a billing reset cannot carry usage into the new cycle.
+
+    Args:
+        batch_size (int): The most users reconciled at once.
+
+    Returns:
+        int: The number of users reconciled.
+    """
+    user_ids = await async_redis_client.spop(SESSION_QUOTA_DIRTY_KEY, batch_size)
+    if not user_ids:
+        return 0
+    pipe = async_redis_client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.hmget(_quota_key(user_id), ["used", "cycle"])
+    rows = []
+    for user_id, (used, cycle) in zip(user_ids, await pipe.execute()):
+        if used is None or cycle is None or cycle.startswith("free:"):
+            continue
+        rows.append((int(user_id), int(used), None if cycle == "none" else datetime.fromisoformat(cycle)))
+    if not rows:
+        return 0
+
+    counts = values(
+        column("user_id", Integer), column("used", Integer), column("cycle", DateTime), name="counts"
+    ).data(rows)
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Subscription)
+                .where(
+                    Subscription.user_id == counts.c.user_id,
+                    Subscription.next_billing_date.is_not_distinct_from(cast(counts.c.cycle, DateTime)),
+                    Subscription.is_active.is_(True),
+                )
+                .values(sessions_used=counts.c.used)
+            )
+            await db.commit()
+    except Exception:
+        # Try these users again on the next run
+        await async_redis_client.sadd(SESSION_QUOTA_DIRTY_KEY, *user_ids)
+        raise
+    return len(rows)
+
+async def _run_reconciler():
+    while True:
+        await asyncio.sleep(SESSION_QUOTA_RECONCILE_INTERVAL)
+        try:
+            while await reconcile_quotas():
+                pass
+        except Exception as e:
+            print(f"Session quota reconcile failed: {e}")
+
+_reconciler_task = None
+
+def start_quota_reconciler():
+    """
+    Start the background task writing session counts back to the database.
+    """
+    global _reconciler_task
+    _reconciler_task = asyncio.create_task(_run_reconciler())
+
+async def stop_quota_reconciler():
+    """
+    Stop the reconciler and write the counts still pending.
+    """
+    global _reconciler_task
+    if _reconciler_task is not None:
+        _reconciler_task.cancel()
+        try:
+            await _reconciler_task
+        except asyncio.CancelledError:
+            pass
+        _reconciler_task = None
+    try:
+        while await reconcile_quotas():
+            pass
+    except Exception as e:
+        print(f"Session quota reconcile failed: {e}")
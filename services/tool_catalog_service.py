@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+import orjson
+from sqlalchemy.orm import Session
+from models.tool import Tool
+from services.redis_service import redis_client, subscribe
+
+# Catalog snapshot settings
+TOOL_CATALOG_MAX_AGE_SECONDS = int(os.getenv("TOOL_CATALOG_MAX_AGE_SECONDS", "600"))
+TOOL_CATALOG_VERSION_KEY = "tools:catalog_version"
+TOOL_CATALOG_CHANNEL = "tools:catalog_changes"
+
+SUMMARY_FIELDS = ("id", "name", "description", "category")
+FULL_FIELDS = SUMMARY_FIELDS + ("content",)
+
+class CatalogSnapshot:
+    """
+    Immutable copy of the tool catalog at one catalog version.
+
+    Serialized listings are built on first request and kept with the
+    snapshot, so repeated fetches of the same listing are a dict lookup.
+    """
+
+    def __init__(self, version: int, tools: list):
+        self.version = version
+        self.tools = tools
+        self.loaded_at = time.monotonic()
+        self._listings = {}
+
+    def listing(self, category: str = None, include_content: bool = False):
+        """
+        Get the JSON listing of the catalog, optionally for one category.
+
+        Args:
+            category (str): Only list tools of this category.
+            include_content (bool): Include each tool's content.
+
+        Returns:
+            bytes: The JSON array of tools.
+        """
+        key = (category, include_content)
+        body = self._listings.get(key)
+        if body is None:
+            fields = FULL_FIELDS if include_content else SUMMARY_FIELDS
+            body = orjson.dumps([
+                {field: tool[field] for field in fields}
+                for tool in self.tools
+                if category is None or tool["category"] == category
+            ])
+            self._listings[key] = body
+        return body
+
+class ToolCatalog:
+    """
+    In-process snapshot of the tool catalog.
+
+    Every change to the catalog bumps a version counter in Redis and is
+    announced on a pub/sub channel; each worker then drops its snapshot and
+    loads a new one on the next request. Until then catalog reads cost no
+    database or Redis work. Snapshots also expire after
+    TOOL_CATALOG_MAX_AGE_SECONDS in case an announcement is missed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._latest_version = 0
+        self._listener = None
+
+    def get(self, db: Session):
+        """
+        Get the current catalog snapshot, loading it if needed.
+
+        Args:
+            db (Session): The database session, only used when loading.
+
+        Returns:
+            CatalogSnapshot: The snapshot.
+        """
+        if self._is_fresh(self._snapshot):
+            return self._snapshot
+        with self._lock:
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            # Read the version before the rows: a change committed meanwhile bumps
+            # _latest_version past this snapshot, which is then reloaded.
+            version = int(redis_client.get(TOOL_CATALOG_VERSION_KEY) or 0)
+            tools = [
+                {field: getattr(tool, field) for field in FULL_FIELDS}
+                for tool in db.query(Tool).order_by(Tool.id).all()
+            ]
+            self._latest_version = max(self._latest_version, version)
+            self._snapshot = CatalogSnapshot(version, tools)
+            return self._snapshot
+
+    def _is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and snapshot.version >= self._latest_version
+            and time.monotonic() - snapshot.loaded_at < TOOL_CATALOG_MAX_AGE_SECONDS
+        )
+
+    def _on_change(self, data):
+        self._latest_version = max(self._latest_version, int(data))
+
+    def publish_change(self):
+        """
+        Announce a committed catalog change to every worker, this one included.
+        """
+        version = redis_client.incr(TOOL_CATALOG_VERSION_KEY)
+        self._on_change(version)
+        redis_client.publish(TOOL_CATALOG_CHANNEL, version)
+
+    def start_listener(self):
+        """
+        Follow catalog changes made by other workers.
+        """
+        if self._listener is None:
+            self._listener = subscribe(TOOL_CATALOG_CHANNEL, self._on_change)
+
+    def stop_listener(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+tool_catalog = ToolCatalog()
@@ -0,0 +1,91 @@
+import os
+import time
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from models.tool_usage_stats import ToolUsageStats
+from models.user_tool import UserTool
+
+# Leaderboard settings
+TOOL_POPULARITY_CACHE_SECONDS = float(os.getenv("TOOL_POPULARITY_CACHE_SECONDS", "60"))
+TOOL_POPULARITY_MAX_LIMIT = int(os.getenv("TOOL_POPULARITY_MAX_LIMIT", "100"))
+
+# (expires_at, [(tool_id, interaction_count), ...]) of this worker
+_leaderboard = (0.0, [])
+
+def record_tool_interaction(db: Session, user_tool: UserTool):
+    """
+    Count a new interaction in its tool's usage stats. The caller commits.
+
+    Args:
+        db (Session): The database session.
+        user_tool (UserTool): The inserted interaction.
+    """
+    stmt = insert(ToolUsageStats).values(
+        tool_id=user_tool.tool_id,
+        interaction_count=1,
+        last_interaction_at=user_tool.interaction_date,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ToolUsageStats.tool_id],
+        set_={
+            "interaction_count": ToolUsageStats.interaction_count + 1,
+            "last_interaction_at": func.greatest(ToolUsageStats.last_interaction_at, stmt.excluded.last_interaction_at),
+        },
+    ))
+
+def popular_tools(db: Session, limit: int):
+    """
+    Get the most used tools.
+
+    The leaderboard is read from the usage stats table, one row per tool, and
+    kept in this worker for TOOL_POPULARITY_CACHE_SECONDS.
+
+    Args:
+        db (Session): The database session.
+        limit (int): The number of tools, at most TOOL_POPULARITY_MAX_LIMIT.
+
+    Returns:
+        list: (tool_id, interaction_count) pairs, most used first.
+    """
+    global _leaderboard
+    expires_at, leaderboard = _leaderboard
+    if time.monotonic() >= expires_at:
+        leaderboard = db.execute(
+            select(ToolUsageStats.tool_id, ToolUsageStats.interaction_count)
+            .order_by(ToolUsageStats.interaction_count.desc(), ToolUsageStats.tool_id)
+            .limit(TOOL_POPULARITY_MAX_LIMIT)
+        ).all()
+        _leaderboard = (time.monotonic() + TOOL_POPULARITY_CACHE_SECONDS, leaderboard)
+    return leaderboard[:limit]
+
+def backfill_tool_usage_stats(engine):
+    """
+    Rebuild the tool usage stats from the user_tools table.
+
+    The stats table is locked for the rebuild, so interactions recorded
+    meanwhile wait and are counted on top of it.
+
+    Args:
+        engine: The database engine.
+
+    Returns:
+        int: The number of tools with interactions.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE tool_usage_stats IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text("DELETE FROM tool_usage_stats"))
+        result = conn.execute(text("""
+            INSERT INTO tool_usage_stats (tool_id, interaction_count, last_interaction_at)
+            SELECT tool_id, COUNT(*), MAX(interaction_date)
+            FROM user_tools
+            WHERE tool_id IS NOT NULL
+            GROUP BY tool_id
+        """))
+        return result.rowcount
+
+if __name__ == "__main__":
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    print(f"Backfilled usage stats of {backfill_tool_usage_stats(engine)} tools")
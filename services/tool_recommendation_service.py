@@ -0,0 +1,297 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+import numpy as np
+from scipy import sparse
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models.tool_cooccurrence import ToolCooccurrence
+from models.tool_neighbor import ToolNeighbor
+from models.user_tool import UserTool
+from services.redis_service import async_redis_client, redis_client
+
+# Recommendation settings
+TOOL_NEIGHBORS_K = int(os.getenv("TOOL_NEIGHBORS_K", "20"))
+TOOL_RECOMMENDATION_RECENT_TOOLS = int(os.getenv("TOOL_RECOMMENDATION_RECENT_TOOLS", "10"))
+TOOL_RECOMMENDATION_RECENT_INTERACTIONS = int(os.getenv("TOOL_RECOMMENDATION_RECENT_INTERACTIONS", "200"))
+TOOL_NEIGHBORS_REFRESH_INTERVAL = float(os.getenv("TOOL_NEIGHBORS_REFRESH_INTERVAL", "30"))
+TOOL_NEIGHBORS_DIRTY_KEY = "tools:neighbors:dirty"
+TOOL_NEIGHBORS_WRITE_BATCH_SIZE = int(os.getenv("TOOL_NEIGHBORS_WRITE_BATCH_SIZE", "10000"))
+# First key of the per-user advisory lock taken while counting co-occurrences
+TOOL_COOCCURRENCE_LOCK_CLASS = 7301
+
+def build_neighbor_index(user_ids, tool_ids, k: int = TOOL_NEIGHBORS_K):
+    """
+    Build the tool co-occurrence counts and top-k neighbour lists from interactions.
+
+    Users and tools form a sparse binary matrix X (repeat interactions count
+    once); X^T X counts, for every pair of tools, the users who used both, and
+    its diagonal each tool's users. Neighbours are ranked by cosine
+    similarity, count(a, b) / sqrt(count(a) * count(b)).
+
+    Args:
+        user_ids (np.ndarray): User ID of each interaction.
+        tool_ids (np.ndarray): Tool ID of each interaction.
+        k (int): Neighbours kept per tool.
+
+    Returns:
+        tuple: The co-occurrence matrix as a scipy COO matrix indexed by tool
+            ID, and the neighbour arrays (tool_id, neighbor_id, score), each
+            tool's neighbours best first.
+    """
+    if not len(tool_ids):
+        empty = np.array([], dtype=np.int64)
+        return sparse.coo_matrix((0, 0)), (empty, empty, np.array([]))
+
+    _, user_index = np.unique(user_ids, return_inverse=True)
+    n_tools = int(tool_ids.max()) + 1
+    usage = sparse.csr_matrix(
+        (np.ones(len(tool_ids), dtype=np.float64), (user_index, tool_ids)),
+        shape=(user_index.max() + 1, n_tools),
+    )
+    usage.data[:] = 1  # Duplicate (user, tool) entries were summed; count them once
+    cooccurrence = (usage.T @ usage).tocoo()
+
+    users_per_tool = cooccurrence.diagonal()
+    off_diagonal = cooccurrence.row != cooccurrence.col
+    rows = cooccurrence.row[off_diagonal]
+    cols = cooccurrence.col[off_diagonal]
+    scores = cooccurrence.data[off_diagonal] / np.sqrt(users_per_tool[rows] * users_per_tool[cols])
+
+    # Best neighbours first within each tool, ties broken by neighbour ID
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else np.array([], dtype=np.int64)
+    counts = np.diff(np.r_[starts, len(rows)])
+    position = np.arange(len(rows)) - np.repeat(starts, counts)
+    keep = position < k
+    return cooccurrence, (rows[keep], cols[keep], scores[keep])
+
+def rebuild_recommendations(engine, k: int = TOOL_NEIGHBORS_K):
+    """
+    Rebuild the co-occurrence counts and neighbour index from user_tools.
+
+    Both tables are locked for the rebuild, so interactions recorded meanwhile
+    wait and are counted on top of it.
+
+    Args:
+        engine: The database engine.
+        k (int): Neighbours kept per tool.
+
+    Returns:
+        int: The number of neighbour rows written.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE tool_cooccurrence, tool_neighbors IN ACCESS EXCLUSIVE MODE"))
+        pairs = conn.execute(
+            select(UserTool.user_id, UserTool.tool_id)
+            .where(UserTool.user_id.isnot(None), UserTool.tool_id.isnot(None))
+            .distinct()
+        ).all()
+        user_ids = np.array([user_id for user_id, _ in pairs], dtype=np.int64)
+        tool_ids = np.array([tool_id for _, tool_id in pairs], dtype=np.int64)
+        cooccurrence, (tools, neighbors, scores) = build_neighbor_index(user_ids, tool_ids, k)
+
+        conn.execute(text("DELETE FROM tool_cooccurrence"))
+        conn.execute(text("DELETE FROM tool_neighbors"))
+        counts = [
+            {"tool_id": int(row), "other_tool_id": int(col), "user_count": int(count)}
+            for row, col, count in zip(cooccurrence.row, cooccurrence.col, cooccurrence.data)
+        ]
+        neighbor_rows = [
+            {"tool_id": int(tool), "neighbor_id": int(neighbor), "score": float(score)}
+            for tool, neighbor, score in zip(tools, neighbors, scores)
+        ]
+        for offset in range(0, len(counts), TOOL_NEIGHBORS_WRITE_BATCH_SIZE):
+            conn.execute(insert(ToolCooccurrence), counts[offset:offset + TOOL_NEIGHBORS_WRITE_BATCH_SIZE])
+        for offset in range(0, len(neighbor_rows), TOOL_NEIGHBORS_WRITE_BATCH_SIZE):
+            conn.execute(insert(ToolNeighbor), neighbor_rows[offset:offset + TOOL_NEIGHBORS_WRITE_BATCH_SIZE])
+    redis_client.delete(TOOL_NEIGHBORS_DIRTY_KEY)
+    return len(neighbor_rows)
+
+def record_tool_cooccurrence(db: Session, user_tool: UserTool):
+    """
+    Count a new interaction in the co-occurrence table. The caller commits.
+
+    Only a user's first interaction with a tool changes the counts: it adds
+    the user to the tool's users and to every pair of the tool with the
+    user's other tools. A transaction-scoped advisory lock per user makes
+    concurrent interactions of one user count in turn, each seeing the tools
+    committed before it, so every pair is counted exactly once.
+
+    Args:
+        db (Session): The database session.
+        user_tool (UserTool): The inserted (flushed) interaction.
+
+    Returns:
+        list: The IDs of the tools whose neighbour lists changed, to pass to
+            mark_neighbors_dirty after commit.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(TOOL_COOCCURRENCE_LOCK_CLASS, user_tool.user_id)))
+    used_tools = set(db.execute(
+        select(UserTool.tool_id).where(UserTool.user_id == user_tool.user_id, UserTool.id != user_tool.id).distinct()
+    ).scalars())
+    if user_tool.tool_id in used_tools:
+        return []
+
+    tool_id = user_tool.tool_id
+    pairs = [(tool_id, tool_id)]
+    for other_id in used_tools:
+        pairs.extend([(tool_id, other_id), (other_id, tool_id)])
+    # A fixed row order keeps concurrent upserts from deadlocking
+    pairs.sort()
+    stmt = insert(ToolCooccurrence).values([
+        {"tool_id": a, "other_tool_id": b, "user_count": 1} for a, b in pairs
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ToolCooccurrence.tool_id, ToolCooccurrence.other_tool_id],
+        set_={"user_count": ToolCooccurrence.user_count + 1},
+    ))
+    return [tool_id, *used_tools]
+
+def mark_neighbors_dirty(tool_ids: list):
+    """
+    Queue tools for the next neighbour refresh.
+    """
+    if tool_ids:
+        redis_client.sadd(TOOL_NEIGHBORS_DIRTY_KEY, *tool_ids)
+
+NEIGHBORS_REFRESH_SQL = text("""
+    INSERT INTO tool_neighbors (tool_id, neighbor_id, score)
+    SELECT tool_id, neighbor_id, score FROM (
+        SELECT c.tool_id, c.other_tool_id AS neighbor_id,
+               c.user_count / sqrt(own.user_count::float8 * other.user_count) AS score,
+               row_number() OVER (
+                   PARTITION BY c.tool_id
+                   ORDER BY c.user_count / sqrt(own.user_count::float8 * other.user_count) DESC, c.other_tool_id
+               ) AS position
+        FROM tool_cooccurrence c
+        JOIN tool_cooccurrence own ON own.tool_id = c.tool_id AND own.other_tool_id = c.tool_id
+        JOIN tool_cooccurrence other ON other.tool_id = c.other_tool_id AND other.other_tool_id = c.other_tool_id
+        WHERE c.tool_id IN :tool_ids AND c.other_tool_id <> c.tool_id
+    ) ranked
+    WHERE position <= :k
+    ON CONFLICT (tool_id, neighbor_id) DO UPDATE SET score = EXCLUDED.score
+""").bindparams(bindparam("tool_ids", expanding=True))
+
+def refresh_neighbors(tool_ids: list, k: int = TOOL_NEIGHBORS_K):
+    """
+    Recompute the neighbour lists of some tools from the co-occurrence table.
+
+    Neighbour lists of tools not refreshed keep their scores until the next
+    full rebuild, even where a refreshed tool gained users.
+
+    Args:
+        tool_ids (list): The tool IDs.
+        k (int): Neighbours kept per tool.
+    """
+    with SessionLocal() as db:
+        db.execute(ToolNeighbor.__table__.delete().where(ToolNeighbor.tool_id.in_(tool_ids)))
+        db.execute(NEIGHBORS_REFRESH_SQL, {"tool_ids": list(tool_ids), "k": k})
+        db.commit()
+
+async def _run_neighbor_refresher():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(TOOL_NEIGHBORS_REFRESH_INTERVAL)
+        try:
+            # SPOP hands each dirty tool to exactly one worker
+            tool_ids = await async_redis_client.spop(TOOL_NEIGHBORS_DIRTY_KEY, 1000)
+            if tool_ids:
+                try:
+                    await loop.run_in_executor(None, refresh_neighbors, [int(tool_id) for tool_id in tool_ids])
+                except Exception:
+                    # Queue the tools again for the next refresh
+                    await async_redis_client.sadd(TOOL_NEIGHBORS_DIRTY_KEY, *tool_ids)
+                    raise
+        except Exception as e:
+            print(f"Tool neighbour refresh failed: {e}")
+
+_refresher_task = None
+
+def start_neighbor_refresher():
+    """
+    Start the background task refreshing the neighbour lists of tools with new interactions.
+    """
+    global _refresher_task
+    _refresher_task = asyncio.create_task(_run_neighbor_refresher())
+
+async def stop_neighbor_refresher():
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+        _refresher_task = None
+
+def score_candidates(neighbor_lists: dict, recent_tools: list, exclude: set, limit: int):
+    """
+    Rank recommendation candidates from the neighbour lists of a user's recent tools.
+
+    Each candidate scores the sum of its similarities to the recent tools, so
+    the work is O(k x recent tools).
+
+    Args:
+        neighbor_lists (dict): Tool ID to a list of (neighbor_id, score).
+        recent_tools (list): The user's recent tool IDs.
+        exclude (set): Tool IDs not to recommend, e.g. those already used.
+        limit (int): The number of recommendations.
+
+    Returns:
+        list: (tool_id, score) pairs, best first.
+    """
+    candidates = defaultdict(float)
+    for tool_id in recent_tools:
+        for neighbor_id, score in neighbor_lists.get(tool_id, ()):
+            if neighbor_id not in exclude:
+                candidates[neighbor_id] += score
+    return sorted(candidates.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+def recommend_tools(db: Session, user_id: int, limit: int):
+    """
+    Recommend tools to a user from the neighbours of the tools they used most recently.
+
+    Only the user's last TOOL_RECOMMENDATION_RECENT_INTERACTIONS interactions
+    are read, newest first along the (user_id, interaction_date, id) index.
+    Tools used in that window are not recommended; tools last used before it
+    may be.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The user ID.
+        limit (int): The number of recommendations.
+
+    Returns:
+        list: (tool_id, score) pairs, best first.
+    """
+    window = db.execute(
+        select(UserTool.tool_id)
+        .where(UserTool.user_id == user_id, UserTool.tool_id.isnot(None))
+        .order_by(UserTool.interaction_date.desc().nulls_last(), UserTool.id.desc())
+        .limit(TOOL_RECOMMENDATION_RECENT_INTERACTIONS)
+    ).scalars().all()
+    used = list(dict.fromkeys(window))  # Distinct tools, most recent first
+    recent = used[:TOOL_RECOMMENDATION_RECENT_TOOLS]
+    if not recent:
+        return []
+
+    neighbor_lists = defaultdict(list)
+    for tool_id, neighbor_id, score in db.execute(
+        select(ToolNeighbor.tool_id, ToolNeighbor.neighbor_id, ToolNeighbor.score)
+        .where(ToolNeighbor.tool_id.in_(recent))
+    ).all():
+        neighbor_lists[tool_id].append((neighbor_id, score))
+    return score_candidates(neighbor_lists, recent, set(used), limit)
+
+if __name__ == "__main__":
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    written = rebuild_recommendations(engine)
+    print(f"Built {written} tool neighbours in {time.perf_counter() - started:.2f}s")